@@ -0,0 +1,66 @@
+# batch_fetch.py
+"""
+Failure isolation for getLogsBatch calls.
+
+When a batch response can't be used (non-JSON, truncated, ok:false for the whole
+batch) the batch is split in halves and each half retried, recursively, until the
+offending file is alone. One bad file in a batch of n then costs about 2·log2(n)
+extra calls instead of n single-file calls.
+
+Files that fail on their own over a working transport are remembered in KNOWN_BAD
+for the rest of the process (summarize_last_7_days and cli.py chains run several
+days and both summarizers in one go): later batches, retry passes and ranged passes
+skip them. Transport failures (timeout, connection error, HTTP 4xx/5xx after the
+session's retries) say nothing about the files, so they are neither bisected nor
+remembered: fetch() raises TransportError and the remaining names come back as
+failed, for the caller's retry pass.
+"""
+from typing import Callable, Hashable, Iterable
+
+KNOWN_BAD: set = set()
+
+
+class TransportError(Exception):
+    """The request itself failed; the batch content is not to blame."""
+
+
+def bisect_batches(names: Iterable[str], fetch: Callable[[list[str]], dict | None],
+                   on_response: Callable[[dict], None],
+                   bad_key: Callable[[str], Hashable] = lambda n: n,
+                   stats: dict | None = None) -> list[str]:
+    """
+    fetch(group) returns the parsed response, None when it is unusable, or raises
+    TransportError. on_response(data) consumes each usable response.
+    Returns the names that failed alone, were already known bad, or were not fetched
+    because of a transport error.
+    """
+    failed: list[str] = []
+    todo = []
+    for n in names:
+        (failed if bad_key(n) in KNOWN_BAD else todo).append(n)
+    if stats is not None:
+        stats["known_bad_skipped"] = stats.get("known_bad_skipped", 0) + len(failed)
+
+    stack = [todo] if todo else []
+    while stack:
+        group = stack.pop()
+        try:
+            data = fetch(group)
+        except TransportError:
+            # an outage fails every call: don't split, hand everything left back
+            failed += group + [n for g in reversed(stack) for n in g]
+            break
+        finally:
+            if stats is not None:
+                stats["calls"] = stats.get("calls", 0) + 1
+        if data is not None:
+            on_response(data)
+            continue
+        if len(group) == 1:
+            KNOWN_BAD.add(bad_key(group[0]))
+            failed.append(group[0])
+            continue
+        mid = len(group) // 2
+        stack.append(group[mid:])
+        stack.append(group[:mid])
+    return failed
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# bench_feeds_scrape.py — time Feeds-table extraction strategies on generated static pages
+"""
+Serves a generated copy of the portal Feeds page (table.dataTable with a hidden
+FeedID column, fa-check / fa-times Active icons and onclick action buttons) from
+a local HTTP server and runs each extraction strategy against it in headless Chrome.
+
+Strategies (all return the same rows: feedId, code, description, active):
+  per_cell     what export_feeds.py / collect_log_ids.py do today: find_elements per
+               row, .text / get_attribute per cell (collect_log_ids helpers reused)
+  js_bulk      one execute_script that walks the table and returns plain arrays
+  page_source  one page_source read, parsed with html.parser in Python
+
+Every WebDriver command is counted (driver.execute is wrapped), so the report shows
+calls next to rows/second. Results of all strategies are checked against each other
+and against the generated truth.
+
+CLI:
+  python bench_feeds_scrape.py                                   # 100,1000,5000,20000 rows
+  python bench_feeds_scrape.py --rows 100,20000 --strategies js_bulk,page_source --repeat 3
+  python bench_feeds_scrape.py --per-cell-max 5000 --out artifacts/bench/feeds.jsonl
+"""
+import argparse
+import html
+import json
+import os
+import random
+import threading
+import time
+from functools import partial
+from html.parser import HTMLParser
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+HEADERS = ("ID", "Code", "Description", "Format", "Last run", "Active", "Actions")
+ID_IDX, CODE_IDX, DESC_IDX, ACTIVE_IDX = 0, 1, 2, 5
+
+
+def log(*a): print("[bench]", *a, flush=True)
+
+
+# ---- fixtures ----
+def generate_rows(n: int, seed: int = 7, active_ratio: float = 0.8) -> list[dict]:
+    rnd = random.Random(seed)
+    words = ("Moda", "Casa", "Sport", "Tech", "Bimbi", "Libri", "Auto", "Pet", "Food", "Beauty")
+    rows = []
+    for i in range(n):
+        fid = 100 + i * 3 + rnd.randint(0, 2)
+        rows.append({
+            "feedId": fid,
+            "code": f"P{fid:05d}",
+            "description": f"{rnd.choice(words)} {rnd.choice(words)} S.r.l. #{i}",
+            "active": rnd.random() < active_ratio,
+        })
+    return rows
+
+
+def render_page(rows: list[dict]) -> str:
+    """Static HTML shaped like the portal's DataTables markup."""
+    out = ['<!doctype html><html><head><meta charset="utf-8"><title>Feeds</title></head><body>',
+           '<div class="dataTables_wrapper"><table id="feeds" class="table dataTable">',
+           "<thead><tr>"]
+    for i, h in enumerate(HEADERS):
+        out.append(f'<th style="display:none">{h}</th>' if i == ID_IDX else f"<th>{h}</th>")
+    out.append("</tr></thead><tbody>")
+    for i, r in enumerate(rows):
+        fid = r["feedId"]
+        icon = '<i class="fa fa-check text-success"></i>' if r["active"] else '<i class="fa fa-times text-danger"></i>'
+        out.append(
+            f'<tr class="{"odd" if i % 2 == 0 else "even"}" role="row">'
+            f'<td style="display:none">{fid}</td>'
+            f"<td>{html.escape(r['code'])}</td>"
+            f"<td>{html.escape(r['description'])}</td>"
+            f"<td>xml</td><td>2025-09-0{1 + i % 9} 0{i % 10}:00</td>"
+            f'<td class="text-center">{icon}</td>'
+            f'<td><a class="btn btn-xs" onclick="editFeed({fid})"><i class="fa fa-pencil"></i></a> '
+            f'<button class="btn btn-xs" onclick="showLog({fid})"><i class="fa fa-file"></i></button></td>'
+            "</tr>")
+    out.append("</tbody></table></div></body></html>")
+    return "".join(out)
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+
+class StaticServer:
+    """Serve a directory on 127.0.0.1:<free port> from a background thread."""
+
+    def __init__(self, root: str):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=root))
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ---- strategies: fn(driver) -> rows ----
+def extract_per_cell(driver) -> list[dict]:
+    from selenium.webdriver.common.by import By
+    from collect_log_ids import extract_feed_id_from_row, is_active_cell
+
+    table = driver.find_element(By.CSS_SELECTOR, "table.dataTable")
+    headers = [th.text.strip().lower() for th in table.find_elements(By.CSS_SELECTOR, "thead th")]
+    code_idx = next((i for i, h in enumerate(headers) if "code" in h), CODE_IDX)
+    desc_idx = next((i for i, h in enumerate(headers) if "description" in h), DESC_IDX)
+    active_idx = next((i for i, h in enumerate(headers) if "active" in h), ACTIVE_IDX)
+    rows = []
+    for tr in table.find_elements(By.CSS_SELECTOR, "tbody tr"):
+        tds = tr.find_elements(By.TAG_NAME, "td")
+        if not tds:
+            continue
+        rows.append({
+            "feedId": extract_feed_id_from_row(tds),
+            "code": (tds[code_idx].text or "").strip(),
+            "description": (tds[desc_idx].text or "").strip(),
+            "active": is_active_cell(tds[active_idx]),
+        })
+    return rows
+
+
+JS_BULK = r"""
+const table = document.querySelector('table.dataTable');
+if (!table) return null;
+const heads = Array.from(table.querySelectorAll('thead th')).map(th => th.textContent.trim().toLowerCase());
+const idx = (keys, dflt) => { const i = heads.findIndex(h => keys.some(k => h.includes(k))); return i < 0 ? dflt : i; };
+const ci = idx(['code', 'codice'], arguments[0]), di = idx(['description', 'descrizione'], arguments[1]),
+      ai = idx(['active', 'attivo'], arguments[2]);
+const out = [];
+for (const tr of table.tBodies[0].rows) {
+  const c = tr.cells;
+  if (!c.length) continue;
+  let id = (c[0].textContent || '').trim();
+  if (!/^\d+$/.test(id)) {
+    const b = c[c.length - 1].querySelector('[onclick]');
+    const m = b && /\((\d+)\)/.exec(b.getAttribute('onclick') || '');
+    id = m ? m[1] : '';
+  }
+  const act = c[ai];
+  out.push([id ? +id : null, c[ci] ? c[ci].innerText.trim() : '', c[di] ? c[di].innerText.trim() : '',
+            !!act && (act.innerHTML.toLowerCase().includes('fa-check') || act.innerText.includes('✓'))]);
+}
+return out;
+"""
+
+
+def extract_js_bulk(driver) -> list[dict]:
+    data = driver.execute_script(JS_BULK, CODE_IDX, DESC_IDX, ACTIVE_IDX) or []
+    return [{"feedId": f, "code": c, "description": d, "active": a} for f, c, d, a in data]
+
+
+class _FeedsTableParser(HTMLParser):
+    """Collect (text, inner attrs) per cell of table.dataTable's tbody."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.in_table = self.in_body = False
+        self.rows: list[list[dict]] = []
+        self.cell: dict | None = None
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == "table" and "dataTable" in (a.get("class") or "").split():
+            self.in_table = True
+        elif self.in_table and tag == "tbody":
+            self.in_body = True
+        elif self.in_body and tag == "tr":
+            self.rows.append([])
+        elif self.in_body and tag == "td":
+            self.cell = {"text": [], "classes": [], "onclick": []}
+        elif self.cell is not None:
+            self.cell["classes"].append(a.get("class") or "")
+            if a.get("onclick"):
+                self.cell["onclick"].append(a["onclick"])
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self.cell is not None:
+            self.cell["text"] = "".join(self.cell["text"]).strip()
+            self.rows[-1].append(self.cell)
+            self.cell = None
+        elif tag == "tbody":
+            self.in_body = False
+        elif tag == "table":
+            self.in_table = False
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell["text"].append(data)
+
+
+def extract_page_source(driver) -> list[dict]:
+    import re
+    p = _FeedsTableParser()
+    p.feed(driver.page_source)
+    rows = []
+    for tds in p.rows:
+        if not tds:
+            continue
+        fid = int(tds[0]["text"]) if tds[0]["text"].isdigit() else None
+        if fid is None:
+            m = next((re.search(r"\((\d+)\)", oc) for oc in tds[-1]["onclick"]), None)
+            fid = int(m.group(1)) if m else None
+        act = tds[ACTIVE_IDX]
+        rows.append({
+            "feedId": fid,
+            "code": tds[CODE_IDX]["text"],
+            "description": tds[DESC_IDX]["text"],
+            "active": any("fa-check" in c for c in act["classes"]) or "✓" in act["text"],
+        })
+    return rows
+
+
+STRATEGIES = {
+    "per_cell": extract_per_cell,
+    "js_bulk": extract_js_bulk,
+    "page_source": extract_page_source,
+}
+
+
+# ---- runner ----
+def make_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    opts = Options()
+    opts.add_argument("--headless=new")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--window-size=1400,1000")
+    return webdriver.Chrome(options=opts)
+
+
+def count_calls(driver) -> dict:
+    """Wrap driver.execute (every WebDriver command goes through it); returns the live counter."""
+    counter = {"calls": 0}
+    orig = driver.execute
+
+    def execute(command, params=None):
+        counter["calls"] += 1
+        return orig(command, params)
+
+    driver.execute = execute
+    return counter
+
+
+def run(sizes: list[int], strategies: list[str], repeat: int, per_cell_max: int, seed: int) -> list[dict]:
+    from readiness import wait_for_datatable
+
+    results = []
+    with TemporaryDirectory() as tmp:
+        for n in sizes:
+            Path(tmp, f"feeds_{n}.html").write_text(render_page(generate_rows(n, seed)), encoding="utf-8")
+        driver = make_driver()
+        counter = count_calls(driver)
+        try:
+            with StaticServer(tmp) as srv:
+                for n in sizes:
+                    truth = generate_rows(n, seed)
+                    driver.get(f"{srv.url}/feeds_{n}.html")
+                    wait_for_datatable(driver, "table.dataTable", 30)
+                    for name in strategies:
+                        if name == "per_cell" and n > per_cell_max:
+                            log(f"{n:>6} rows  {name:<12} skipped (--per-cell-max {per_cell_max})")
+                            continue
+                        for rep in range(repeat):
+                            counter["calls"] = 0
+                            t0 = time.perf_counter()
+                            rows = STRATEGIES[name](driver)
+                            secs = time.perf_counter() - t0
+                            res = {"rows": n, "strategy": name, "run": rep + 1, "seconds": round(secs, 4),
+                                   "rows_per_s": round(n / secs, 1) if secs else None,
+                                   "webdriver_calls": counter["calls"], "correct": rows == truth}
+                            results.append(res)
+                            log(f"{n:>6} rows  {name:<12} {secs:8.3f}s  {res['rows_per_s']:>10} rows/s  "
+                                f"{counter['calls']:>7} calls" + ("" if res["correct"] else "  MISMATCH"))
+        finally:
+            driver.quit()
+    return results
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="100,1000,5000,20000", help="comma list of table sizes")
+    ap.add_argument("--strategies", default=",".join(STRATEGIES), help=f"comma list ({','.join(STRATEGIES)})")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--per-cell-max", type=int, default=20000,
+                    help="skip per_cell above this many rows (it makes ~8 WebDriver calls per row)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="append one JSON line per measurement here")
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    sizes = [int(x) for x in args.rows.split(",") if x.strip()]
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = [s for s in strategies if s not in STRATEGIES]
+    if unknown:
+        raise SystemExit(f"Unknown strategy(s): {unknown}")
+    results = run(sizes, strategies, args.repeat, args.per_cell_max, args.seed)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r, separators=(",", ":")) + "\n")
+    if not all(r["correct"] for r in results):
+        raise SystemExit("Some strategies returned rows that differ from the fixture")
+
+
+if __name__ == "__main__":
+    from profiling import profiled
+    profiled(main)()
@@ -0,0 +1,152 @@
+# cassette.py
+"""
+Record / replay every web-app HTTP call of a run, for offline performance comparisons.
+
+  HTTP_CASSETTE=runs/2025-09-06.jsonl.gz
+  HTTP_CASSETTE_MODE=record | replay
+  HTTP_REPLAY_LATENCY=1            (replay: sleep the recorded latency of each call)
+
+Record: the real call is made and its response (status, headers, body, latency)
+appended to the cassette. Replay: nothing goes on the wire; responses are served
+from the cassette in recorded order.
+
+Matching: requests are keyed by (endpoint, sha1 of the JSON body). The endpoint is
+the env var name holding the URL (WEBAPP_URL, LOGS_WRITER_URL) so no deployment
+URL is written to disk and replay works with dummy URLs. Bodies that embed the
+current time (updatedAt, …) fall back to (endpoint, action) in recorded order.
+"""
+from __future__ import annotations
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+import config
+from webapp_client import endpoint_of
+
+if TYPE_CHECKING:
+    import requests
+
+
+def body_key(body) -> tuple[str, str]:
+    """(action, sha1) for a JSON body; action is the single top-level key of web-app payloads."""
+    if body is None:
+        return "", ""
+    action = next(iter(body), "") if isinstance(body, dict) and len(body) == 1 else type(body).__name__
+    blob = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    return action, hashlib.sha1(blob).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str, replay_latency: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"HTTP_CASSETTE_MODE must be record|replay, got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.entries: list[dict] = []
+        self._by_key: dict[tuple, deque] = defaultdict(deque)
+        self._by_action: dict[tuple, deque] = defaultdict(deque)
+        self._orig = None
+        if mode == "replay":
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for ln in f:
+                    e = json.loads(ln)
+                    self._by_key[(e["endpoint"], e["sha"])].append(e)
+                    self._by_action[(e["endpoint"], e["action"])].append(e)
+
+    # ---- patching ----
+    def install(self) -> "Cassette":
+        import requests  # only runs with a cassette configured
+        self._orig = requests.Session.request
+        cas = self
+
+        def request(session, method, url, *args, **kwargs):
+            return cas._handle(session, method, url, args, kwargs)
+
+        requests.Session.request = request
+        if self.mode == "record":
+            atexit.register(self.save)
+        return self
+
+    def uninstall(self) -> None:
+        if self._orig is not None:
+            import requests
+            requests.Session.request = self._orig
+            self._orig = None
+            if self.mode == "record":
+                atexit.unregister(self.save)
+                self.save()
+
+    def _handle(self, session, method, url, args, kwargs):
+        ep = endpoint_of(url)
+        action, sha = body_key(kwargs.get("json"))
+        if self.mode == "record":
+            t0 = time.perf_counter()
+            r = self._orig(session, method, url, *args, **kwargs)
+            self.entries.append({
+                "endpoint": ep, "method": method.upper(), "action": action, "sha": sha,
+                "status": r.status_code,
+                "headers": {k: v for k, v in r.headers.items()
+                            if k.lower() not in ("content-encoding", "transfer-encoding", "content-length")},
+                "body": base64.b64encode(r.content).decode("ascii"),
+                "latency": round(time.perf_counter() - t0, 4),
+            })
+            return r
+        e = self._take(ep, action, sha)
+        if self.replay_latency:
+            time.sleep(e["latency"])
+        return self._response(e, url)
+
+    def _take(self, ep: str, action: str, sha: str) -> dict:
+        q = self._by_key.get((ep, sha))
+        e = q.popleft() if q else None
+        if e is None:
+            qa = self._by_action.get((ep, action))
+            e = qa.popleft() if qa else None
+            if e is None:
+                raise RuntimeError(f"cassette miss: {ep} {action} {sha[:12]} ({self.path})")
+            self._by_key[(ep, e["sha"])].remove(e)
+        else:
+            self._by_action[(ep, action)].remove(e)
+        return e
+
+    @staticmethod
+    def _response(e: dict, url: str) -> requests.Response:
+        import requests
+        from requests.structures import CaseInsensitiveDict
+        r = requests.Response()
+        r.status_code = e["status"]
+        r.headers = CaseInsensitiveDict(e["headers"])
+        r._content = base64.b64decode(e["body"])
+        r.url = url
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers) or "utf-8"
+        r.elapsed = timedelta(seconds=e["latency"])
+        r.reason = "REPLAY"
+        return r
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for e in self.entries:
+                f.write(json.dumps(e, separators=(",", ":")) + "\n")
+        print(f"[cassette] recorded {len(self.entries)} calls → {self.path}", flush=True)
+
+
+def install_from_env() -> Cassette | None:
+    """Install a cassette when HTTP_CASSETTE is set; no-op otherwise."""
+    path = config.env("HTTP_CASSETTE")
+    if not path:
+        return None
+    mode = config.env("HTTP_CASSETTE_MODE", "replay").lower()
+    if mode == "replay":
+        os.environ.setdefault("WEBAPP_RATE", "0")  # no quota to respect offline (webapp_client)
+    latency = config.flag("HTTP_REPLAY_LATENCY")
+    return Cassette(path, mode, latency).install()
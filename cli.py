@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# cli.py — one entry point for every script; chained commands share one process
+"""
+  python cli.py <command> [args] [+ <command> [args] ...]
+
+Commands (flags as in the script they run):
+
+  export-feeds                 export_feeds.py
+  get-logs-day [--date D] [--counts-only]
+                               get_logs_day.py
+  collect-log-ids              collect_log_ids.py
+  summarize [--date D] [--incremental]
+                               summarize_log_counts.py
+  by-partner [...]             summarize_log_counts_by_partner.py
+  last-7-days                  summarize_last_7_days.py
+  pipeline [...]               daily_pipeline.py
+  watch [...]                  watch_logs.py
+  mirror sync|summarize ...    logs_mirror.py
+  bench-feeds [...]            bench_feeds_scrape.py
+  serve [...]                  ranged_fetch.py serve
+
+Commands joined with "+" run in order in one process: .env, the imports and the
+web-app session / scheduler (webapp_client) are set up once, and results are handed
+over in memory like daily_pipeline.py does — get-logs-day's index entries go to
+summarize / by-partner for the same day (they default to that day), collect-log-ids'
+rows go to by-partner. get-logs-day --counts-only already posts the totals and the
+per-partner rows and archives nothing, so summarize / by-partner steps for that day
+are skipped. The chain stops at the first failing command.
+
+  python cli.py get-logs-day --date 2025-09-03 + summarize + by-partner --clear-first
+  python cli.py collect-log-ids + get-logs-day + by-partner
+
+Modules are imported by the command that needs them, so `python cli.py --help` or a
+summarize run never loads selenium, and nothing is read from .env before use.
+"""
+import argparse
+import sys
+import time
+
+SEP = "+"
+
+
+def log(*a): print("[cli]", *a, flush=True)
+
+
+def _parser(prog: str) -> argparse.ArgumentParser:
+    return argparse.ArgumentParser(prog=f"cli.py {prog}")
+
+
+def _as_script(module, prog: str, argv: list[str]):
+    """module.main() with sys.argv set for its own argparse."""
+    saved = sys.argv
+    sys.argv = [f"cli.py {prog}"] + argv
+    try:
+        return module.main()
+    finally:
+        sys.argv = saved
+
+
+def _counted(ctx: dict, day: str | None, step: str) -> bool:
+    """True (and logged) when get-logs-day --counts-only already posted this day."""
+    if day and day == ctx.get("counted"):
+        log(f"{step}: {day} already posted by get-logs-day --counts-only (no archive to read); skipped")
+        return True
+    return False
+
+
+def _index_for(ctx: dict, day: str | None) -> dict | None:
+    """get-logs-day's index entries when they are for this day."""
+    return ctx.get("index") if day and day == ctx.get("day") else None
+
+
+# ---- commands: fn(argv, ctx) ----
+def cmd_export_feeds(argv, ctx):
+    _parser("export-feeds").parse_args(argv)
+    import export_feeds
+    return export_feeds.main()
+
+
+def cmd_get_logs_day(argv, ctx):
+    ap = _parser("get-logs-day")
+    ap.add_argument("--date", help="YYYY-MM-DD (default: LOGS_DATE, else the newest day in the folder)")
+    ap.add_argument("--counts-only", action="store_true",
+                    help="count in the page and post totals + partner rows; nothing archived")
+    args = ap.parse_args(argv)
+    import get_logs_day
+    out = get_logs_day.main(args.date, counts_only=args.counts_only or None)
+    ctx["day"], ctx["index"] = out["day"], out["index"]
+    if out.get("counts") is not None:
+        ctx["counted"] = out["day"]
+    return out
+
+
+def cmd_collect_log_ids(argv, ctx):
+    _parser("collect-log-ids").parse_args(argv)
+    import collect_log_ids
+    ctx["logids"] = collect_log_ids.main()
+    return ctx["logids"]
+
+
+def cmd_summarize(argv, ctx):
+    ap = _parser("summarize")
+    ap.add_argument("--date", help="YYYY-MM-DD (default: the chain's day, LOGS_DATE, else today/yesterday)")
+    ap.add_argument("--incremental", action="store_true", help="same as INCREMENTAL=1")
+    args = ap.parse_args(argv)
+    import summarize_log_counts
+    day = args.date or ctx.get("day")
+    if not day:
+        return summarize_log_counts.main(incremental=args.incremental or None)
+    ctx["day"] = day
+    if _counted(ctx, day, "summarize"):
+        return None
+    return summarize_log_counts.summarize_day_and_post(day, incremental=args.incremental or None,
+                                                       index=_index_for(ctx, day))
+
+
+def cmd_by_partner(argv, ctx):
+    import summarize_log_counts_by_partner
+    if ctx.get("day") and not any(a == "--date" or a.startswith("--date=") for a in argv):
+        argv = ["--date", ctx["day"]] + argv
+    day = summarize_log_counts_by_partner.parse_args(argv).date
+    if _counted(ctx, day, "by-partner"):
+        return None
+    return summarize_log_counts_by_partner.main(argv, index=_index_for(ctx, day), logids=ctx.get("logids"))
+
+
+def cmd_last_7_days(argv, ctx):
+    _parser("last-7-days").parse_args(argv)
+    import summarize_last_7_days
+    return summarize_last_7_days.main()
+
+
+def cmd_pipeline(argv, ctx):
+    import daily_pipeline
+    return _as_script(daily_pipeline, "pipeline", argv)
+
+
+def cmd_watch(argv, ctx):
+    import watch_logs
+    return _as_script(watch_logs, "watch", argv)
+
+
+def cmd_mirror(argv, ctx):
+    import logs_mirror
+    return _as_script(logs_mirror, "mirror", argv)
+
+
+def cmd_bench_feeds(argv, ctx):
+    import bench_feeds_scrape
+    return _as_script(bench_feeds_scrape, "bench-feeds", argv)
+
+
+def cmd_serve(argv, ctx):
+    import ranged_fetch
+    return _as_script(ranged_fetch, "serve", ["serve"] + argv)
+
+
+COMMANDS = {
+    "export-feeds":    cmd_export_feeds,
+    "get-logs-day":    cmd_get_logs_day,
+    "collect-log-ids": cmd_collect_log_ids,
+    "summarize":       cmd_summarize,
+    "by-partner":      cmd_by_partner,
+    "last-7-days":     cmd_last_7_days,
+    "pipeline":        cmd_pipeline,
+    "watch":           cmd_watch,
+    "mirror":          cmd_mirror,
+    "bench-feeds":     cmd_bench_feeds,
+    "serve":           cmd_serve,
+}
+
+
+def split_chain(argv: list[str]) -> list[tuple[str, list[str]]]:
+    chain, cur = [], []
+    for a in argv + [SEP]:
+        if a != SEP:
+            cur.append(a)
+            continue
+        if not cur:
+            raise SystemExit(f"empty command in chain (stray {SEP!r})")
+        if cur[0] not in COMMANDS:
+            raise SystemExit(f"unknown command {cur[0]!r}; one of: {', '.join(COMMANDS)}")
+        chain.append((cur[0], cur[1:]))
+        cur = []
+    return chain
+
+
+def main(argv: list[str] | None = None) -> dict:
+    """Run the chain; returns the shared context (day, index, logids) for in-process callers."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(__doc__.strip())
+        return {}
+    chain = split_chain(argv)
+    ctx: dict = {}
+    timings = []
+    for name, args in chain:
+        t0 = time.perf_counter()
+        if len(chain) > 1:
+            log(f"{name}: start")
+        COMMANDS[name](args, ctx)
+        timings.append((name, time.perf_counter() - t0))
+    if len(chain) > 1:
+        log("done: " + ", ".join(f"{n}={t:.1f}s" for n, t in timings))
+    return ctx
+
+
+if __name__ == "__main__":
+    from cassette import install_from_env
+    from profiling import profiled
+    install_from_env()
+    profiled(main)()
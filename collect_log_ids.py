@@ -1,42 +1,11 @@
-import os, time, json, re
-from typing import Final, List, Dict
-import requests
-
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-# -------- env helpers --------
-def load_env_here(filename: str = ".env") -> None:
-    here = os.path.dirname(__file__)
-    path = os.path.join(here, filename)
-    if not os.path.exists(path): return
-    with open(path, "r", encoding="utf-8") as f:
-        for ln in f:
-            s = ln.strip()
-            if not s or s.startswith("#") or "=" not in s: continue
-            k, v = s.split("=", 1)
-            k = k.strip()
-            v = v.strip().strip('"').strip("'")
-            if k and (k not in os.environ):
-                os.environ[k] = v
-
-def _env(k: str, d: str = "") -> str:
-    v = os.getenv(k, d)
-    return d if v is None else str(v)
-
-load_env_here()
-
-PORTAL_LOGIN_URL: Final[str] = _env("PORTAL_LOGIN_URL")
-PORTAL_FEEDS_URL: Final[str] = _env("PORTAL_FEEDS_URL")
-PORTAL_USER:      Final[str] = _env("PORTAL_USER")
-PORTAL_PASS:      Final[str] = _env("PORTAL_PASS")
-WEBAPP_URL:       Final[str] = _env("WEBAPP_URL")
-
-WAIT_TIMEOUT = int(_env("WAIT_TIMEOUT","30"))
-BETWEEN_STEPS_S = float(_env("BETWEEN_STEPS_S","0.3"))
+import re
+from typing import List, Dict
+
+import config
+import webapp_client as webapp
+from readiness import Waits, wait_for_datatable, wait_for_selector, wait_for_url
+
+REQUIRED = ("PORTAL_LOGIN_URL", "PORTAL_FEEDS_URL", "PORTAL_USER", "PORTAL_PASS", "WEBAPP_URL")
 ONLY_ACTIVE = True  # collect only active rows
 
 def log(*a): print("[logids]", *a, flush=True)
@@ -61,6 +30,7 @@ def extract_feed_id_from_row(tds) -> int | None:
     # fallback: parse onclicks in last cell
     try:
         actions_td = tds[-1]
+        from selenium.webdriver.common.by import By
         btns = actions_td.find_elements(By.CSS_SELECTOR, "[onclick]")
         for b in btns:
             oc = b.get_attribute("onclick") or ""
@@ -70,9 +40,17 @@ def extract_feed_id_from_row(tds) -> int | None:
         pass
     return None
 
-def main():
-    if not all([PORTAL_LOGIN_URL, PORTAL_FEEDS_URL, PORTAL_USER, PORTAL_PASS, WEBAPP_URL]):
-        raise SystemExit("Missing one or more env vars: PORTAL_LOGIN_URL, PORTAL_FEEDS_URL, PORTAL_USER, PORTAL_PASS, WEBAPP_URL")
+def main() -> List[Dict]:
+    """Scrape active LogIDs and upsert them; returns the rows for in-process callers."""
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.options import Options
+
+    missing = [k for k in REQUIRED if not config.env(k)]
+    if missing:
+        raise SystemExit("Missing one or more env vars: " + ", ".join(missing))
+    PORTAL_LOGIN_URL, PORTAL_FEEDS_URL, PORTAL_USER, PORTAL_PASS, WEBAPP_URL = (config.env(k) for k in REQUIRED)
+    WAIT_TIMEOUT = config.num("WAIT_TIMEOUT", 30)
 
     opts = Options()
     opts.add_argument("--headless=new")
@@ -82,19 +60,20 @@ def main():
 
     driver = webdriver.Chrome(options=opts)
     rows_out: List[Dict] = []
+    waits = Waits()
     try:
         # Login
         driver.get(PORTAL_LOGIN_URL)
-        WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.NAME, "data[username]")))
+        wait_for_selector(driver, "[name='data[username]']", WAIT_TIMEOUT, waits, "login-form")
         driver.find_element(By.NAME, "data[username]").send_keys(PORTAL_USER)
         driver.find_element(By.NAME, "data[password]").send_keys(PORTAL_PASS)
         driver.find_element(By.ID, "login-submit").click()
-        WebDriverWait(driver, WAIT_TIMEOUT).until(EC.url_contains("gestionale"))
+        wait_for_url(driver, "gestionale", WAIT_TIMEOUT, waits, "login-redirect")
 
-        # Feeds
+        # Feeds: DataTables' init event instead of rows-present + a fixed settle
         driver.get(PORTAL_FEEDS_URL)
-        WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.CSS_SELECTOR, "table.dataTable tbody tr")))
-        time.sleep(BETWEEN_STEPS_S)  # small settle
+        wait_for_datatable(driver, "table.dataTable", WAIT_TIMEOUT, waits, "feeds-table")
+        waits.report("logids")
 
         # Read headers to locate columns
         table = driver.find_element(By.CSS_SELECTOR, "table.dataTable")
@@ -137,15 +116,17 @@ def main():
                 "rows": rows_out
             }
         }
-        resp = requests.post(WEBAPP_URL, json=payload, timeout=120)
+        resp = webapp.post(WEBAPP_URL, json=payload, timeout=120)
         try:
             j = resp.json()
         except Exception:
             j = {"status": resp.status_code, "text": resp.text[:200]}
         log("Upsert:", j)
+        return rows_out
 
     finally:
         driver.quit()
 
 if __name__ == "__main__":
-    main()
+    from profiling import profiled
+    profiled(main)()
@@ -0,0 +1,78 @@
+# config.py
+"""
+Settings shared by every script, read on first use instead of at import.
+
+  env("LOGS_FOLDER", "LogsArchive")   optional value ("" when unset and no default)
+  require("WEBAPP_URL")               value, or SystemExit naming the missing variable
+  flag("INCREMENTAL")                 1/true/yes/y → True (default False)
+  num("LIST_PAGE_SIZE", 500)          int/float value, default when unset/empty
+
+The first call loads .env with python-dotenv (current directory first, then the one
+next to the scripts; full dotenv syntax: inline comments, quotes, escapes, multi-line
+values); variables already in the environment win. Without python-dotenv installed
+.env is not read, as before. Importing a module therefore
+never reads .env, never exits and never needs credentials — a missing variable
+only fails the command that actually uses it.
+"""
+import os
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+TRUE = ("1", "true", "yes", "y")
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def _parse(path: Path) -> None:
+    try:
+        from dotenv import load_dotenv  # pip install python-dotenv
+    except ImportError:
+        return
+    load_dotenv(dotenv_path=path, override=False)
+
+
+def load(path: str | None = None) -> None:
+    """Load .env once (or the given file, always). Real environment variables are never overwritten."""
+    global _loaded
+    if path is not None:
+        p = Path(path)
+        if p.is_file():
+            _parse(p)
+        return
+    with _lock:
+        if _loaded:
+            return
+        _loaded = True
+        for p in dict.fromkeys((Path.cwd() / ".env", ROOT / ".env")):
+            if p.is_file():
+                _parse(p)
+
+
+def env(name: str, default: str = "") -> str:
+    load()
+    v = os.getenv(name)
+    return default if v is None else str(v).strip()
+
+
+def require(name: str) -> str:
+    v = env(name)
+    if not v:
+        raise SystemExit(f"Missing required environment variable: {name}")
+    return v
+
+
+def flag(name: str, default: bool = False) -> bool:
+    v = env(name)
+    return default if not v else v.lower() in TRUE
+
+
+def num(name: str, default: int | float):
+    v = env(name)
+    if not v:
+        return default
+    try:
+        return type(default)(v)
+    except ValueError:
+        return default
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# daily_pipeline.py — run the whole daily chain in one process as a dependency graph
+"""
+Stages (→ = depends on):
+
+  export_feeds                                   Feeds table → sheet
+  get_logs_day                                   portal logs → Drive (+ _index.json.gz)
+  collect_log_ids                                portal Feeds → LogIDs sheet
+  summarize_log_counts   → get_logs_day          daily totals
+  summarize_by_partner   → get_logs_day, collect_log_ids
+
+Independent stages run concurrently (the two Selenium scrapers alongside the log
+archive). Results are handed over in memory: the summarizers get get_logs_day's
+index entries and the by-partner writer gets collect_log_ids' rows, so neither
+re-reads Drive or the LogIDs sheet. Each stage is retried on its own; when a stage
+finally fails, its dependents are skipped and the rest still run.
+
+CLI:
+  python daily_pipeline.py                        # yesterday (Europe/Rome), all stages
+  python daily_pipeline.py --date 2025-09-03 --only get_logs_day,summarize_by_partner
+  python daily_pipeline.py --skip export_feeds --retries 3
+"""
+import argparse
+import time
+import traceback
+import datetime as dt
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("Europe/Rome")
+
+
+def log(*a): print("[pipeline]", *a, flush=True)
+
+
+# ---- stages: fn(day, results) -> result ----
+def run_export_feeds(day, results):
+    import export_feeds
+    return export_feeds.main()
+
+
+def run_get_logs_day(day, results):
+    import get_logs_day
+    return get_logs_day.main(day)
+
+
+def run_collect_log_ids(day, results):
+    import collect_log_ids
+    return collect_log_ids.main()
+
+
+def run_summarize_log_counts(day, results):
+    import summarize_log_counts
+    archived = results.get("get_logs_day") or {}
+    return summarize_log_counts.summarize_day_and_post(day, index=archived.get("index"))
+
+
+def run_summarize_by_partner(day, results):
+    import summarize_log_counts_by_partner
+    archived = results.get("get_logs_day") or {}
+    return summarize_log_counts_by_partner.main(
+        ["--date", day], index=archived.get("index"), logids=results.get("collect_log_ids"))
+
+
+STAGES = {
+    "export_feeds":         (run_export_feeds, ()),
+    "get_logs_day":         (run_get_logs_day, ()),
+    "collect_log_ids":      (run_collect_log_ids, ()),
+    "summarize_log_counts": (run_summarize_log_counts, ("get_logs_day",)),
+    "summarize_by_partner": (run_summarize_by_partner, ("get_logs_day", "collect_log_ids")),
+}
+
+
+def run_stage(name, fn, day, results, retries, backoff):
+    for attempt in range(1, retries + 2):
+        t0 = time.perf_counter()
+        try:
+            log(f"{name}: start (attempt {attempt})")
+            out = fn(day, results)
+            return out, time.perf_counter() - t0
+        except BaseException as e:  # stages may sys.exit / raise SystemExit on bad config
+            if isinstance(e, KeyboardInterrupt):
+                raise
+            log(f"{name}: attempt {attempt} failed after {time.perf_counter() - t0:.1f}s: {e!r}")
+            traceback.print_exc()
+            if attempt > retries:
+                raise RuntimeError(f"{name} failed") from e
+            time.sleep(backoff * attempt)
+
+
+def run_pipeline(day: str, stages: dict, retries: int = 1, backoff: float = 30.0,
+                 max_workers: int = 4) -> dict:
+    """Run stages respecting deps; returns {name: "ok"|"failed"|"skipped"} plus timings in the log."""
+    status: dict[str, str] = {}
+    results: dict = {}
+    timings: dict[str, float] = {}
+    pending = dict(stages)
+    running = {}
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        while pending or running:
+            for name, (fn, deps) in list(pending.items()):
+                deps = [d for d in deps if d in stages]
+                if any(status.get(d) in ("failed", "skipped") for d in deps):
+                    status[name] = "skipped"
+                    log(f"{name}: skipped (dependency failed)")
+                    del pending[name]
+                elif all(status.get(d) == "ok" for d in deps):
+                    running[ex.submit(run_stage, name, fn, day, results, retries, backoff)] = name
+                    del pending[name]
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    results[name], timings[name] = fut.result()
+                    status[name] = "ok"
+                    log(f"{name}: ok in {timings[name]:.1f}s")
+                except Exception:
+                    status[name] = "failed"
+    log(f"done in {time.perf_counter() - t_start:.1f}s: " +
+        ", ".join(f"{n}={status[n]}" + (f"({timings[n]:.1f}s)" if n in timings else "") for n in stages))
+    return status
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--date", help="YYYY-MM-DD (default: yesterday Europe/Rome)")
+    ap.add_argument("--only", help=f"comma list of stages ({','.join(STAGES)})")
+    ap.add_argument("--skip", help="comma list of stages to leave out")
+    ap.add_argument("--retries", type=int, default=1, help="extra attempts per stage")
+    ap.add_argument("--backoff", type=float, default=30.0, help="seconds × attempt between retries")
+    ap.add_argument("--max-workers", type=int, default=4)
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    day = args.date or (dt.datetime.now(TZ) - dt.timedelta(days=1)).date().isoformat()
+    names = list(STAGES)
+    if args.only:
+        names = [n.strip() for n in args.only.split(",") if n.strip()]
+    if args.skip:
+        names = [n for n in names if n not in {s.strip() for s in args.skip.split(",")}]
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {unknown}")
+    log(f"Day={day} stages={names}")
+    status = run_pipeline(day, {n: STAGES[n] for n in names}, args.retries, args.backoff, args.max_workers)
+    if any(v != "ok" for v in status.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    from cassette import install_from_env
+    from profiling import profiled
+    install_from_env()
+    profiled(main)()
@@ -0,0 +1,191 @@
+# day_bundle.py
+"""
+Per-day bundle written by get_logs_day next to the per-file logs (which stay as they are):
+
+  LogsArchive/YYYY-MM-DD/_bundle.gz
+    member 0       gzip of {"version": 1, "day": "...", "generatedAt": "...",
+                            "files": [{"name": "..._feed_442.log.gz", "feedId": 442,
+                                       "offset": <from the end of member 0>, "length": <gz bytes>}, ...]}
+    member 1..n    each file's .log.gz bytes, byte-identical to LogsArchive/YYYY-MM-DD/<name>
+
+The file is a plain multi-member gzip (zcat prints the index line, then every log).
+Offsets count from the end of member 0, so the index can go first without knowing
+its own compressed size. Readers need getLogRange (ranged_fetch.py) on the bundle:
+
+  one ranged read of the head    → the index (member 0 ends where zlib reports unused data),
+                                   plus the members that fit in the same HEAD_BYTES
+  selected feeds                 → their members, adjacent ones merged into one read
+                                   (gaps up to BUNDLE_GAP, reads up to LOG_RANGE_CHUNK)
+  the whole day                  → the same with every member: size / LOG_RANGE_CHUNK reads
+
+A member is only used while its length equals the listLogs size of the per-file
+object and that object's lastUpdated is not later than the bundle's generatedAt, so
+files rewritten after the bundle (e.g. by watch_logs) are read one by one.
+The name doesn't end in .log / .log.gz, so the log listings skip it.
+
+ENV:
+  BUNDLE_GAP=65536        bytes of unwanted members a merged read may span
+"""
+import base64
+import json
+import zlib
+from datetime import datetime
+from typing import Callable
+
+import config
+from log_parse import file_feed_id
+
+BUNDLE_NAME = "_bundle.gz"
+BUNDLE_VERSION = 1
+HEAD_BYTES = 256 * 1024   # first read; grown until member 0 is complete
+
+
+class BundleWriter:
+    """Collects archived members in memory (the upload is one base64 body) and encodes
+    the bundle. Past cap bytes the writer is over_cap: the buffer is freed and later
+    members are only counted, since the bundle won't be uploaded anyway."""
+
+    def __init__(self, cap: int | None = None):
+        self._data = bytearray()
+        self.files: list[dict] = []
+        self.cap = cap
+        self.over_cap = False
+        self.size = 0  # bytes of every member added, kept after the buffer is freed
+
+    def add(self, gz_name: str, gz_bytes: bytes) -> None:
+        self.size += len(gz_bytes)
+        if self.over_cap:
+            return
+        if self.cap is not None and self.size > self.cap:
+            self.over_cap = True
+            self.close()
+            return
+        self.files.append({"name": gz_name, "feedId": file_feed_id(gz_name),
+                           "offset": len(self._data), "length": len(gz_bytes)})
+        self._data += gz_bytes
+
+    def encode(self, day: str) -> bytes:
+        if self.over_cap:
+            raise ValueError(f"bundle over cap ({self.size} > {self.cap} bytes)")
+        head = {
+            "version": BUNDLE_VERSION,
+            "day": day,
+            "generatedAt": datetime.now().astimezone().isoformat(timespec="milliseconds"),
+            "files": self.files,
+        }
+        co = zlib.compressobj(9, zlib.DEFLATED, 31)  # gzip wrapper, mtime 0
+        member0 = co.compress(json.dumps(head, separators=(",", ":")).encode("utf-8")) + co.flush()
+        return member0 + self._data
+
+    def close(self) -> None:
+        self._data = bytearray()
+        self.files = []
+
+
+def decode_head(raw: bytes) -> tuple[int, dict[str, dict]] | None:
+    """
+    (data start, {name: entry}) from the first bytes of a bundle; None if member 0 is
+    incomplete. Entries carry the bundle's generatedAt as bundledAt (epoch ms, or None).
+    """
+    d = zlib.decompressobj(31)
+    text = d.decompress(raw)
+    if not d.eof:
+        return None
+    body = json.loads(text.decode("utf-8"))
+    if body.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"bundle version {body.get('version')!r}")
+    try:
+        at = int(datetime.fromisoformat(body["generatedAt"]).timestamp() * 1000)
+    except (KeyError, TypeError, ValueError):
+        at = None
+    return len(raw) - len(d.unused_data), {e["name"]: {**e, "bundledAt": at}
+                                           for e in body.get("files", []) if e.get("name")}
+
+
+def read_range(post: Callable[[dict], dict], day: str, offset: int, length: int,
+               folder: str = "LogsArchive", chunk: int | None = None) -> bytes:
+    """length bytes of the day's bundle from offset, in getLogRange pieces of at most chunk bytes."""
+    from ranged_fetch import range_chunk
+    chunk = chunk or range_chunk()
+    out = bytearray()
+    while len(out) < length:
+        at = offset + len(out)
+        r = post({"getLogRange": {"folderName": folder, "date": day, "filename": BUNDLE_NAME,
+                                  "offset": at, "length": min(chunk, length - len(out))}})
+        if not r.get("ok") or int(r.get("offset", -1)) != at:
+            raise RuntimeError(f"getLogRange {day}/{BUNDLE_NAME} @{at} failed: {str(r)[:300]}")
+        piece = base64.b64decode(r.get("contentBase64") or "")
+        out += piece
+        if not piece or at + len(piece) >= int(r.get("size", at + len(piece) + 1)):
+            break  # EOF: the caller checks the length
+    return bytes(out)
+
+
+def read_index(post: Callable[[dict], dict], day: str,
+               folder: str = "LogsArchive") -> tuple[int, dict[str, dict], bytes]:
+    """(data start, {name: entry}, bytes read) of the day's bundle; RuntimeError when absent or unreadable."""
+    from ranged_fetch import range_chunk
+    want = min(HEAD_BYTES, range_chunk())
+    while True:
+        raw = read_range(post, day, 0, want, folder)
+        head = decode_head(raw)
+        if head is not None:
+            return head[0], head[1], raw
+        if len(raw) < want:
+            raise RuntimeError(f"{day}/{BUNDLE_NAME}: truncated index")
+        want *= 4
+
+
+def spans(entries: list[dict], gap: int, cap: int) -> list[tuple[int, int, list[dict]]]:
+    """Members sorted by offset, merged into (offset, length, members) reads of at most cap bytes."""
+    out: list[tuple[int, int, list[dict]]] = []
+    for e in sorted(entries, key=lambda e: e["offset"]):
+        if out:
+            off, length, members = out[-1]
+            end = e["offset"] + e["length"]
+            if e["offset"] - (off + length) <= gap and end - off <= cap:
+                out[-1] = (off, end - off, members + [e])
+                continue
+        out.append((e["offset"], e["length"], [e]))
+    return out
+
+
+def current(e: dict | None, meta: dict) -> bool:
+    """True when the member still matches the listed per-file object (same size, not rewritten since)."""
+    if not e:
+        return False
+    try:
+        if meta.get("size") is None or int(meta["size"]) != int(e["length"]):
+            return False
+        if meta.get("lastUpdated") and (not e.get("bundledAt") or int(meta["lastUpdated"]) > e["bundledAt"]):
+            return False
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def fetch_members(post: Callable[[dict], dict], day: str, metas: list[dict],
+                  folder: str = "LogsArchive") -> dict[str, bytes]:
+    """
+    .log.gz bytes of the listed files that the day's bundle holds, by name, in a few ranged
+    reads. metas are listLogs entries; a member is skipped unless current(). Files not
+    returned must be fetched one by one.
+    """
+    from ranged_fetch import range_chunk
+    start, index, head = read_index(post, day, folder)
+    wanted = []
+    for m in metas:
+        e = index.get(m.get("name", ""))
+        if current(e, m):
+            wanted.append(e)
+    out: dict[str, bytes] = {}
+    for off, length, members in spans(wanted, config.num("BUNDLE_GAP", 65536), range_chunk()):
+        if start + off + length <= len(head):
+            buf = head[start + off:start + off + length]  # small days: already in the index read
+        else:
+            buf = read_range(post, day, start + off, length, folder)
+        if len(buf) < length:
+            raise RuntimeError(f"{day}/{BUNDLE_NAME}: short read at {start + off}")
+        for e in members:
+            out[e["name"]] = buf[e["offset"] - off:e["offset"] - off + e["length"]]
+    return out
@@ -0,0 +1,88 @@
+# day_index.py
+"""
+Per-day sidecar index written by get_logs_day next to the archived logs:
+
+  LogsArchive/YYYY-MM-DD/_index.json.gz
+    {"version": 1, "day": "...", "generatedAt": "...",
+     "files": [{"name": "..._feed_442.log.gz", "feedId": 442, "size": <gz bytes>,
+                "sha": <sha1 of the text, 16 hex>, "latest": <iso or null>,
+                "totals": {errore, aggiungere, aggiornare},
+                "partner": {errore, aggiungere, aggiornare}}, ...]}
+
+Summarizers read it first and only download raw logs the index does not cover:
+missing entry, listLogs without a size or with a size other than the archived one,
+or a listLogs lastUpdated later than the index's generatedAt (rewritten afterwards).
+"""
+import gzip
+import hashlib
+import json
+from datetime import datetime
+
+from log_parse import count_log, count_partner, file_feed_id
+
+INDEX_NAME = "_index.json.gz"
+INDEX_VERSION = 1
+
+
+def index_entry(gz_name: str, text: str, gz_size: int) -> dict:
+    totals = count_log(text)
+    latest = totals.pop("latest")
+    return {
+        "name": gz_name,
+        "feedId": file_feed_id(gz_name),
+        "size": gz_size,
+        "sha": hashlib.sha1(text.encode("utf-8")).hexdigest()[:16],
+        "latest": latest.isoformat() if latest else None,
+        "totals": totals,
+        "partner": count_partner(text),
+    }
+
+
+def encode_index(day: str, entries: list[dict]) -> bytes:
+    body = {
+        "version": INDEX_VERSION,
+        "day": day,
+        "generatedAt": datetime.now().astimezone().isoformat(timespec="milliseconds"),
+        "files": entries,
+    }
+    return gzip.compress(json.dumps(body, separators=(",", ":")).encode("utf-8"), mtime=0)
+
+
+def decode_index(raw: bytes) -> dict[str, dict]:
+    """Index payload → {archived filename: entry}; {} if unreadable or from a newer format."""
+    try:
+        if raw[:2] == b"\x1f\x8b":
+            raw = gzip.decompress(raw)
+        body = json.loads(raw.decode("utf-8"))
+    except Exception:
+        return {}
+    if body.get("version") != INDEX_VERSION:
+        return {}
+    try:
+        at = int(datetime.fromisoformat(body["generatedAt"]).timestamp() * 1000)
+    except (KeyError, TypeError, ValueError):
+        at = None
+    return {e["name"]: {**e, "indexedAt": at} for e in body.get("files", []) if e.get("name")}
+
+
+def covered(index: dict[str, dict], meta: dict) -> dict | None:
+    """Index entry usable for this listLogs entry, or None if the raw log must be read."""
+    e = index.get(meta.get("name", ""))
+    if not e:
+        return None
+    try:
+        if meta.get("size") is None or int(meta["size"]) != int(e.get("size", -1)):
+            return None
+        if e.get("indexedAt") and meta.get("lastUpdated") and int(meta["lastUpdated"]) > e["indexedAt"]:
+            return None
+    except (TypeError, ValueError):
+        return None
+    return e
+
+
+def index_counts(entry: dict, kind: str) -> dict:
+    """Counters for 'totals' (with 'latest' as datetime) or 'partner' from an entry."""
+    c = dict(entry[kind])
+    if kind == "totals":
+        c["latest"] = datetime.fromisoformat(entry["latest"]) if entry.get("latest") else None
+    return c
@@ -1,97 +1,81 @@
 # export_feeds.py
-import os, time, json, requests
-from typing import Final
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-from env_utils import load_env, require_env
-
-load_env(".env")
-
-PORTAL_LOGIN: Final[str] = require_env("PORTAL_LOGIN_URL")
-PORTAL_FEEDS: Final[str] = require_env("PORTAL_FEEDS_URL")
-PORTAL_USER:  Final[str] = require_env("PORTAL_USER")
-PORTAL_PASS:  Final[str] = require_env("PORTAL_PASS")
-WEBAPP:       Final[str] = require_env("WEBAPP_URL")
-
-opts = Options()
-opts.add_argument("--headless=new")
-opts.add_argument("--no-sandbox")
-opts.add_argument("--disable-dev-shm-usage")
-driver = webdriver.Chrome(options=opts)
-def make_session() -> requests.Session:
-    retry = Retry(
-        total=5,           # overall attempts (1 original + 4 retries)
-        connect=5,
-        read=5,
-        backoff_factor=1.5,                  # 0s, 1.5s, 3s, 4.5s, 6s …
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods={"GET", "POST"},     # include POST retries
-        raise_on_status=False,
-    )
-    s = requests.Session()
-    s.mount("https://", HTTPAdapter(max_retries=retry))
-    s.mount("http://",  HTTPAdapter(max_retries=retry))
-    return s
-
-try:
-    # LOGIN
-    driver.get(PORTAL_LOGIN)
-    WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.NAME, 'data[username]')))
-    driver.find_element(By.NAME, "data[username]").send_keys(PORTAL_USER)
-    driver.find_element(By.NAME, "data[password]").send_keys(PORTAL_PASS)
-    driver.find_element(By.ID, "login-submit").click()
-    WebDriverWait(driver, 20).until(EC.url_contains("gestionale"))
-
-    # FEEDS
-    driver.get(PORTAL_FEEDS)
-    WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.CSS_SELECTOR, "table.dataTable tbody tr")))
-
-    table = driver.find_element(By.CSS_SELECTOR, "table.dataTable")
-    headers = [th.text.strip() for th in table.find_elements(By.CSS_SELECTOR, "thead th")]
-
-    code_idx = next((i for i, h in enumerate(headers) if "code" in h.lower()), -1)
-    desc_idx = next((i for i, h in enumerate(headers) if "description" in h.lower()), -1)
-    active_idx = next((i for i, h in enumerate(headers) if "active" in h.lower()), -1)
-    if code_idx == -1 or desc_idx == -1 or active_idx == -1:
-        raise RuntimeError("Could not find required columns in table header")
-
-    rows_data = []
-    rows = table.find_elements(By.CSS_SELECTOR, "tbody tr")
-
-    for idx, tr in enumerate(rows, start=1):
-        tds = tr.find_elements(By.TAG_NAME, "td")
-        if len(tds) <= max(code_idx, desc_idx, active_idx):
-            continue
-
-        code = (tds[code_idx].text or "").strip()
-        desc = (tds[desc_idx].text or "").strip()
-        active_cell = tds[active_idx]
-        active_text = (active_cell.text or "").strip().lower()
-        inner_html = active_cell.get_attribute("innerHTML") or ""  # <-- coalesce None → ""
-
-        is_active = ('✓' in active_text) or ("fa-check" in inner_html)
-
-        if code or desc:
-            rows_data.append({"S.No": idx, "Code": code, "Description": desc, "Active": is_active})
-
-    print(f"Extracted {len(rows_data)} rows")
-
-    # Transfer to Google Sheets
-    session = make_session()
-    # (connect timeout, read timeout)
-    res = session.post(WEBAPP, json=rows_data, timeout=(15, 180))
-    print("Sheet updated!", res.text)
-
-except Exception as e:
-    print("Could not complete the scraping task")
-    print("Current page URL:", driver.current_url)
-    print("Full error:")
-    raise
-finally:
-    driver.quit()
+import config
+import webapp_client as webapp
+from readiness import Waits, wait_for_datatable, wait_for_selector, wait_for_url
+
+REQUIRED = ("PORTAL_LOGIN_URL", "PORTAL_FEEDS_URL", "PORTAL_USER", "PORTAL_PASS", "WEBAPP_URL")
+
+def main():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+
+    PORTAL_LOGIN, PORTAL_FEEDS, PORTAL_USER, PORTAL_PASS, WEBAPP = (config.require(k) for k in REQUIRED)
+
+    opts = Options()
+    opts.add_argument("--headless=new")
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    driver = webdriver.Chrome(options=opts)
+    waits = Waits()
+
+    try:
+        # LOGIN
+        driver.get(PORTAL_LOGIN)
+        wait_for_selector(driver, "[name='data[username]']", 20, waits, "login-form")
+        driver.find_element(By.NAME, "data[username]").send_keys(PORTAL_USER)
+        driver.find_element(By.NAME, "data[password]").send_keys(PORTAL_PASS)
+        driver.find_element(By.ID, "login-submit").click()
+        wait_for_url(driver, "gestionale", 20, waits, "login-redirect")
+
+        # FEEDS
+        driver.get(PORTAL_FEEDS)
+        wait_for_datatable(driver, "table.dataTable", 20, waits, "feeds-table")
+        waits.report("feeds")
+
+        table = driver.find_element(By.CSS_SELECTOR, "table.dataTable")
+        headers = [th.text.strip() for th in table.find_elements(By.CSS_SELECTOR, "thead th")]
+
+        code_idx = next((i for i, h in enumerate(headers) if "code" in h.lower()), -1)
+        desc_idx = next((i for i, h in enumerate(headers) if "description" in h.lower()), -1)
+        active_idx = next((i for i, h in enumerate(headers) if "active" in h.lower()), -1)
+        if code_idx == -1 or desc_idx == -1 or active_idx == -1:
+            raise RuntimeError("Could not find required columns in table header")
+
+        rows_data = []
+        rows = table.find_elements(By.CSS_SELECTOR, "tbody tr")
+
+        for idx, tr in enumerate(rows, start=1):
+            tds = tr.find_elements(By.TAG_NAME, "td")
+            if len(tds) <= max(code_idx, desc_idx, active_idx):
+                continue
+
+            code = (tds[code_idx].text or "").strip()
+            desc = (tds[desc_idx].text or "").strip()
+            active_cell = tds[active_idx]
+            active_text = (active_cell.text or "").strip().lower()
+            inner_html = active_cell.get_attribute("innerHTML") or ""  # <-- coalesce None → ""
+
+            is_active = ('✓' in active_text) or ("fa-check" in inner_html)
+
+            if code or desc:
+                rows_data.append({"S.No": idx, "Code": code, "Description": desc, "Active": is_active})
+
+        print(f"Extracted {len(rows_data)} rows")
+
+        # Transfer to Google Sheets
+        # (connect timeout, read timeout)
+        res = webapp.post(WEBAPP, json=rows_data, timeout=(15, 180))
+        print("Sheet updated!", res.text)
+
+    except Exception as e:
+        print("Could not complete the scraping task")
+        print("Current page URL:", driver.current_url)
+        print("Full error:")
+        raise
+    finally:
+        driver.quit()
+
+if __name__ == "__main__":
+    from profiling import profiled
+    profiled(main)()
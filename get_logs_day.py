@@ -2,45 +2,42 @@
 # get_logs_day.py — fetch all .log files for a given day (or latest day) and upload to Drive
 
 import gzip
-import os, re, time
+import re
 from urllib.parse import urlparse, urljoin
-from datetime import datetime, timezone
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import base64, json
 
-import base64, json, requests
+import config
+import readiness
+import webapp_client as webapp
+from readiness import Waits, enter_elfinder, wait_for_selector, wait_for_unload, wait_for_url
+from day_bundle import BUNDLE_NAME, BundleWriter
+from day_index import INDEX_NAME, encode_index, index_counts, index_entry
+from log_parse import file_feed_id
 
 TZ = ZoneInfo("Europe/Rome")
 
-# ----- env -----
-def load_env(path=".env"):
-    if os.path.exists(path):
-        for ln in open(path, encoding="utf-8"):
-            if not ln.strip() or ln.lstrip().startswith("#") or "=" not in ln:
-                continue
-            k, v = ln.rstrip().split("=", 1)
-            os.environ.setdefault(k, v)
-load_env()
-
-LOGIN_URL   = os.environ["PORTAL_LOGIN_URL"]
-PORTAL_USER = os.environ["PORTAL_USER"]
-PORTAL_PASS = os.environ["PORTAL_PASS"]
-LOGS_URL    = os.environ["PORTAL_LOGS_URL"]
-WEBAPP_URL  = os.environ["WEBAPP_URL"]
-ELFINDER_LABEL = os.getenv("ELFINDER_LABEL", "allegati-log").strip().lower()
-LOGS_DATE   = os.getenv("LOGS_DATE")  # YYYY-MM-DD or None
-SHOW_BROWSER = os.getenv("SHOW_BROWSER", "false").lower() in ("1","true","yes")
-DRY_RUN = os.getenv("PREVIEW_ONLY", "false").lower() in ("1","true","yes")
+# ----- env (read on first use; selenium is imported by the functions that drive the browser) -----
+REQUIRED = ("PORTAL_LOGIN_URL", "PORTAL_USER", "PORTAL_PASS", "PORTAL_LOGS_URL", "WEBAPP_URL")
+# optional: ELFINDER_LABEL (allegati-log), LOGS_DATE, SHOW_BROWSER, PREVIEW_ONLY,
+#           LIST_MODE (auto: search once the folder is known to hold only dated names,
+#           else open | search | open), LIST_PAGE_SIZE (500),
+#           COUNTS_ONLY (count in the page and post the summaries; nothing archived),
+#           LOGS_BUNDLE (1: also upload _bundle.gz; 0: per-file only), LOGS_BUNDLE_MAX (30000000)
+
+def check_env() -> None:
+    """SystemExit naming the first missing required variable."""
+    for k in REQUIRED:
+        config.require(k)
 
 # ----- driver -----
 def driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
     opts = Options()
-    if not SHOW_BROWSER:
+    if not config.flag("SHOW_BROWSER"):
         opts.add_argument("--headless=new")
     opts.add_argument("--no-sandbox")
     opts.add_argument("--disable-dev-shm-usage")
@@ -50,99 +47,202 @@ def driver():
 def origin(u:str)->str:
     p=urlparse(u); return f"{p.scheme}://{p.netloc}"
 
-def switch_into_elfinder_iframe(drv) -> bool:
-    for i, fr in enumerate(drv.find_elements(By.TAG_NAME, "iframe")):
-        try:
-            drv.switch_to.frame(fr)
-            has_container = drv.execute_script("return !!document.querySelector('.elfinder, #elfinder');")
-            if has_container:
-                print(f"[logs] Switched into iframe #{i} (elFinder container found)")
-                return True
-        except Exception:
-            pass
-        drv.switch_to.default_content()
-    return False
-
-def wait_for_elfinder(drv, timeout=60):
-    WebDriverWait(drv, timeout).until(lambda d: d.execute_script("return document.readyState") == "complete")
-    deadline = time.time() + timeout
-
-    def has_container():
-        try:
-            return drv.execute_script("return !!document.querySelector('.elfinder, #elfinder');")
-        except Exception:
-            return False
-
-    if not has_container():
-        while time.time() < deadline and not switch_into_elfinder_iframe(drv):
-            time.sleep(0.3)
-        if not has_container():
-            raise RuntimeError("elFinder container not found")
-
-    while time.time() < deadline:
-        try:
-            ok = drv.execute_script("var $=window.$||window.jQuery; try{ return !!($('.elfinder').elfinder('instance')); }catch(e){ return false; }")
-            if ok: return
-        except Exception:
-            pass
-        time.sleep(0.3)
-    raise RuntimeError("elFinder instance not initialized in time")
+def wait_for_elfinder(drv, timeout=60, waits: Waits | None = None):
+    """Switch into elFinder's frame and wait for its first folder to open (page events, no polling)."""
+    enter_elfinder(drv, timeout, waits)
+    readiness.wait_for_elfinder(drv, timeout, waits)
 
 # ----- JS helpers (same logic as patches) -----
-def js_list_logs_for_cwd():
+def js_list_logs_for_day():
     return r"""
 const done = arguments[arguments.length-1];
+const opt = arguments[0] || {};
 (async () => {
   try {
     const $ = window.$ || window.jQuery;
     const inst = $('.elfinder').elfinder('instance');
     if (!inst) return done({ok:false, error:'no instance'});
 
+    // later pages come from the list kept by the first call
+    const key = JSON.stringify([opt.day, opt.start, opt.end]);
+    const kept = window.__logsDay;
+    if (opt.offset > 0 && kept && kept.key === key) {
+      return done({ok:true, day:opt.day, via:kept.via, total:kept.entries.length,
+                   entries:kept.entries.slice(opt.offset, opt.offset + opt.limit)});
+    }
+
     const label = %s;
     const nav = document.querySelector('.elfinder-navbar') || document;
     const nodes = nav.querySelectorAll('a, .elfinder-navbar-dir, .elfinder-navbar-root');
+    let el = null;
     for (const n of nodes) {
       const t = (n.textContent||'').trim().toLowerCase();
-      if (t === label || t.includes(label)) { (n.closest('a')||n).click(); break; }
+      if (t === label || t.includes(label)) { el = n.closest('a')||n; break; }
     }
-
-    const until = Date.now()+10000;
-    while(Date.now()<until){
-      const cwd = inst.cwd(); if (cwd && cwd.hash) break;
-      await new Promise(r=>setTimeout(r,150));
+    // the label's folder opens asynchronously: wait for elFinder's 'open' event, unless the
+    // clicked dir is already the active one (nothing to open) and a cwd exists. The handler
+    // is bound only then and always unbound (a stale one would fire on a later open)
+    const opening = !!el && !(el.closest('.elfinder-navbar-dir, .elfinder-navbar-root')||el).classList.contains('ui-state-active');
+    const c0 = inst.cwd();
+    let opened = null;
+    if (opening || !(c0 && c0.hash)) {
+      opened = new Promise(resolve => {
+        const fn = () => { clearTimeout(t); inst.unbind('open', fn); resolve(); };
+        const t = setTimeout(() => { inst.unbind('open', fn); resolve(); }, 10000);
+        inst.bind('open', fn);
+      });
     }
+    if (el) el.click();
+    if (opened) await opened;
     const cwd = inst.cwd(); if (!cwd || !cwd.hash) return done({ok:false, error:'no cwd'});
 
-    await new Promise((resolve)=>{ inst.request({cmd:'open', target: cwd.hash, reload:true}).done(()=>resolve()).fail(()=>resolve()); });
-
-    const files = Object.values(inst.files ? inst.files() : {})
-      .filter(f => f && f.phash===cwd.hash && f.mime!=='directory' && /\.log$/i.test(String(f.name||'')));
-
-    const entries = files.map(f => {
-      const m = String(f.name||'').match(/^(\d{4}-\d{2}-\d{2})/);
-      return { name: f.name, hash: f.hash, ts: f.ts||0, dateFromName: m? m[1]: null };
+    // preventDefault: the response is handed to us only (no UI redraw, no cache merge)
+    const req = (data) => new Promise((resolve)=>{
+      inst.request({data, preventDefault:true}).done(d=>resolve(d||{})).fail(()=>resolve(null));
     });
+    const isLog = f => f && f.mime!=='directory' && /\.log$/i.test(String(f.name||''));
+    const dateFromName = f => { const m = String(f.name||'').match(/^(\d{4}-\d{2}-\d{2})/); return m ? m[1] : null; };
+
+    // 1) name search for the day: only matching entries cross the connector. It can't see
+    //    undated names picked by ts, so auto mode only searches once a listing of this
+    //    folder showed every .log name dated (LIST_MODE=search asserts that up front)
+    let files = null, via = null;
+    const dated = window.__logsDated;
+    const searchable = opt.mode === 'search' ||
+                       (opt.mode !== 'open' && dated && dated.cwd === cwd.hash && dated.all);
+    if (opt.day && searchable) {
+      const d = await req({cmd:'search', q:opt.day, target:cwd.hash});
+      if (d && Array.isArray(d.files)) {
+        files = d.files.filter(f => isLog(f) && (!f.phash || f.phash===cwd.hash) && dateFromName(f)===opt.day);
+        via = 'search';
+        if (!files.length) files = null;  // no dated names: the ts window below needs the folder listing
+      }
+    }
 
-    const dayOf = (e)=> e.dateFromName || (e.ts? new Date(e.ts*1000).toISOString().slice(0,10): null);
-    const days = entries.map(dayOf).filter(Boolean).sort();
-    const latestDay = days.length ? days[days.length-1] : null;
+    // 2) folder listing, filtered here by name prefix or ts window
+    if (!files) {
+      let all = (opt.reuse && window.__logsOpen && window.__logsOpen.cwd === cwd.hash) ? window.__logsOpen.files : null;
+      if (!all) {
+        const d = await req({cmd:'open', target:cwd.hash, reload:1});
+        all = ((d && Array.isArray(d.files)) ? d.files : Object.values(inst.files ? inst.files() : {}))
+          .filter(f => isLog(f) && f.phash===cwd.hash)
+          .map(f => ({name:f.name, hash:f.hash, ts:f.ts||0, size:f.size||0}));
+        window.__logsOpen = {cwd:cwd.hash, files:all};
+        window.__logsDated = {cwd:cwd.hash, all: all.every(f => dateFromName(f))};
+      }
+      via = 'open';
+      if (!opt.day) {
+        const days = all.map(f => dateFromName(f) || (f.ts ? new Date(f.ts*1000).toISOString().slice(0,10) : null))
+                        .filter(Boolean).sort();
+        return done({ok:true, latestDay: days.length ? days[days.length-1] : null, entries:[], total:0, via});
+      }
+      files = all.filter(f => dateFromName(f) ? dateFromName(f)===opt.day : (f.ts>=opt.start && f.ts<opt.end));
+    }
 
-    done({ ok:true, latestDay, entries });
+    const entries = files.map(f => ({name:f.name, hash:f.hash, ts:f.ts||0, size:f.size||0}))
+                         .sort((a, b) => a.name < b.name ? -1 : a.name > b.name ? 1 : 0);
+    window.__logsDay = {key, via, entries};
+    const from = opt.offset || 0;  // a later page whose kept list was lost (reload): same slice
+    done({ok:true, day:opt.day, via, total:entries.length, entries:entries.slice(from, from + opt.limit)});
   } catch(e) { done({ ok:false, error:String(e) }); }
 })();
-""" % json.dumps(ELFINDER_LABEL)
+""" % json.dumps(config.env("ELFINDER_LABEL", "allegati-log").lower())
+
+def day_window(day: str) -> tuple[int, int]:
+    """[start, end) epoch seconds of a Europe/Rome calendar day (DST-aware)."""
+    d0 = datetime.fromisoformat(day).replace(tzinfo=TZ)
+    d1 = (d0 + timedelta(days=1)).replace(tzinfo=TZ)
+    return int(d0.timestamp()), int(d1.timestamp())
+
+def list_day_entries(drv, day: str | None) -> tuple[str | None, list[dict]]:
+    """
+    (day, entries) for the target day, filtered inside the page and paged across
+    WebDriver. Without a day the newest one in the folder is picked first.
+    """
+    reuse = False
+    if not day:
+        res = drv.execute_async_script(js_list_logs_for_day(), {"mode": "open"})
+        if not res.get("ok"): raise RuntimeError(res)
+        day = res["latestDay"]
+        if not day:
+            return None, []
+        reuse = True  # filter the listing just made instead of opening the folder again
+    start, end = day_window(day)
+    opt = {"day": day, "start": start, "end": end, "mode": config.env("LIST_MODE", "auto").lower(),
+           "limit": config.num("LIST_PAGE_SIZE", 500), "reuse": reuse}
+    entries: list[dict] = []
+    while True:
+        res = drv.execute_async_script(js_list_logs_for_day(), {**opt, "offset": len(entries)})
+        if not res.get("ok"): raise RuntimeError(res)
+        entries += res["entries"]
+        if not res["entries"] or len(entries) >= res["total"]:
+            break
+    print(f"[list] {day}: {len(entries)} files via {res.get('via')}")
+    return day, entries
+
+# counts-only mode: log_parse's patterns run in the page (count_log / count_partner / latest_timestamp)
+JS_COUNT_TEXT = r"""
+const countText = async (txt) => {
+  const sum = (rx, partner) => {
+    let n = 0;
+    for (const m of txt.matchAll(rx)) n += Number(partner ? (m[1].replace(/\D/g, '') || 0) : m[1]);
+    return n;
+  };
+  const totals = {
+    errore:     sum(/Prodotti in errore Google\s*:\s*(\d+)/gi),
+    aggiungere: sum(/Prodotti da aggiungere\s*:\s*(\d+)/gi),
+    aggiornare: sum(/Prodotti da aggiornare su Google\s*:\s*(\d+)/gi),
+  };
+  const partner = {
+    errore:     sum(/prodotti\s+in\s+errore\s+google\s*:\s*([\d.,]+)/gi, true),
+    aggiungere: sum(/prodotti\s+da\s+aggiungere\s*:\s*([\d.,]+)/gi, true),
+    aggiornare: sum(/prodotti\s+da\s+aggiornare\s+su\s+google\s*:\s*([\d.,]+)/gi, true),
+  };
+  // 'Mon, 01 Sep 2025 12:34:56 +0200' at line start; newest = last stamp when the last
+  // three are in order, else the max (what latest_timestamp() returns)
+  const MON = {Jan:1, Feb:2, Mar:3, Apr:4, May:5, Jun:6, Jul:7, Aug:8, Sep:9, Oct:10, Nov:11, Dec:12};
+  const pad = (v, n) => String(v).padStart(n, '0');
+  let max = null, tail = [];
+  for (const m of txt.matchAll(/^([A-Z][a-z]{2},\s\d{2}\s[A-Z][a-z]{2}\s\d{4}\s\d{2}:\d{2}:\d{2}\s[+-]\d{4})\b/gm)) {
+    const s = m[1], mon = MON[s.slice(8, 11)];
+    const y = +s.slice(12, 16), d = +s.slice(5, 7), H = +s.slice(17, 19), M = +s.slice(20, 22), S = +s.slice(23, 25);
+    const off = (s[26] === '-' ? -1 : 1) * (+s.slice(27, 29) * 60 + +s.slice(29, 31));
+    const u = new Date(0); u.setUTCFullYear(y, (mon || 1) - 1, d);
+    if (!mon || y < 1 || u.getUTCDate() !== d || H > 23 || M > 59 || S > 59 || Math.abs(off) >= 1440) continue;
+    const a = Math.abs(off);
+    const st = {t: u.getTime() + ((H * 60 + M - off) * 60 + S) * 1000,
+                iso: `${pad(y, 4)}-${pad(mon, 2)}-${pad(d, 2)}T${s.slice(17, 25)}${off < 0 ? '-' : '+'}${pad(Math.floor(a / 60), 2)}:${pad(a % 60, 2)}`};
+    if (!max || st.t > max.t) max = st;
+    tail.push(st); if (tail.length > 3) tail.shift();
+  }
+  const inOrder = tail.every((st, i) => i === 0 || tail[i - 1].t <= st.t);
+  const latest = tail.length ? (inOrder ? tail[tail.length - 1] : max).iso : null;
+  const bytes = new TextEncoder().encode(txt);
+  let sha = null;
+  try {
+    const h = new Uint8Array(await crypto.subtle.digest('SHA-1', bytes));
+    sha = Array.from(h.slice(0, 8), b => pad(b.toString(16), 2)).join('');
+  } catch(e) {}  // crypto.subtle only exists on https pages
+  return {size: bytes.length, sha, latest, totals, partner};
+};
+"""
 
-def js_fetch_one_by_hash():
-    return r"""
+def js_fetch_one_by_hash(counts_only: bool = False):
+    """Fetch one file in the page; counts_only returns countText()'s record instead of the text."""
+    result = ("return done(Object.assign({ok:true, name:String(file.name||'log.txt'), used}, await countText(txt)));"
+              if counts_only else
+              "return done({ok:true, name:String(file.name||'log.txt'), text:txt, used});")
+    return (JS_COUNT_TEXT if counts_only else "") + r"""
 const done = arguments[arguments.length-1];
-(async (hash) => {
+(async (hash, listedName) => {
   try {
     const $ = window.$ || window.jQuery;
     const inst = $('.elfinder').elfinder('instance');
     if (!inst) return done({ok:false, error:'no instance'});
 
     const base = new URL(inst.options?.url || inst.opts?.url, location.href).href;
-    const file = inst.file(hash);
+    // search results are not merged into elFinder's cache: fall back to the listed name
+    const file = inst.file(hash) || (listedName ? {name: listedName} : null);
     if (!file) return done({ok:false, error:'hash not found'});
 
     // read or connector
@@ -174,92 +274,171 @@ const done = arguments[arguments.length-1];
       txt = await rf.text(); used='file';
     }
     txt = txt.replace(/[\u200B\u200C\u200D\u2060\uFEFF]/g, '');
-    return done({ok:true, name:String(file.name||'log.txt'), text:txt, used});
+    RESULT
   } catch(e){ done({ok:false, error:String(e)}); }
-})(arguments[0]);
-"""
+})(arguments[0], arguments[1]);
+""".replace("RESULT", result)
 
 # ----- upload -----
-def upload_log_to_drive(filename: str, content_text: str, day: str | None):
-    import base64, requests
-    gz_name = filename if filename.endswith(".gz") else (filename + ".gz")
-    gz_bytes = gzip.compress(content_text.encode("utf-8"))
-    b64 = base64.b64encode(gz_bytes).decode("ascii")
+def upload_bytes_to_drive(filename: str, data: bytes, mime_type: str, day: str | None):
     payload = {
         "uploadLog": {
-            "filename": gz_name,
-            "contentBase64": b64,
-            "mimeType": "application/gzip",
+            "filename": filename,
+            "contentBase64": base64.b64encode(data).decode("ascii"),
+            "mimeType": mime_type,
             "folderName": "LogsArchive",
             "useDateSubfolder": True,
             "date": day,
             "overwrite": "delete",
         }
     }
-    if DRY_RUN:
-        print(f"[dry-run] would upload {gz_name} → {day or '(today)'} (gzipped)")
+    if config.flag("PREVIEW_ONLY"):
+        print(f"[dry-run] would upload {filename} → {day or '(today)'} ({len(data)} bytes)")
         return {"ok": True, "dryRun": True}
-    r = requests.post(WEBAPP_URL, json=payload, timeout=120)
+    r = webapp.post(config.require("WEBAPP_URL"), json=payload, timeout=120)
     try:
         return r.json()
     except Exception:
         return {"ok": False, "status": r.status_code, "text": r.text}
 
+def gz_name_for(filename: str) -> str:
+    return filename if filename.endswith(".gz") else (filename + ".gz")
+
+def upload_log_to_drive(filename: str, content_text: str, day: str | None, gz_bytes: bytes | None = None):
+    if gz_bytes is None:
+        gz_bytes = gzip.compress(content_text.encode("utf-8"))
+    return upload_bytes_to_drive(gz_name_for(filename), gz_bytes, "application/gzip", day)
+
+# ----- session steps (shared with watch_logs.py) -----
+def open_logs_browser(drv, waits: Waits | None = None) -> None:
+    """Log in, open the elFinder logs page and wait for the instance."""
+    from selenium.webdriver.common.by import By
+    login_url, logs_url = config.require("PORTAL_LOGIN_URL"), config.require("PORTAL_LOGS_URL")
+    drv.get(login_url)
+    wait_for_selector(drv, "[name='data[username]']", 20, waits, "login-form")
+    drv.find_element(By.NAME, "data[username]").send_keys(config.require("PORTAL_USER"))
+    drv.find_element(By.NAME, "data[password]").send_keys(config.require("PORTAL_PASS"))
+    drv.find_element(By.ID, "login-submit").click()
+    wait_for_url(drv, "gestionale", 20, waits, "login-redirect")
+
+    # goto elFinder logs (get() returns with the page loaded: the title is final)
+    href = logs_url if logs_url.startswith("http") else urljoin(origin(login_url), "/gestionale/elfinder/?log")
+    drv.get(href)
+    if "Dashboard" in (drv.title or ""):
+        links = drv.find_elements(By.CSS_SELECTOR, "a[href*='elfinder/?log']")
+        if links:
+            drv.execute_script("arguments[0].click()", links[0])
+            wait_for_unload(drv, links[0], 20, waits, "elfinder-link")
+    wait_for_elfinder(drv, waits=waits)
+
+def archive_entry(drv, e: dict, day: str, label: str = "", bundle: BundleWriter | None = None) -> dict | None:
+    """Fetch one listed file, upload it gzipped (and add it to bundle); returns its index entry (None on failure)."""
+    d = drv.execute_async_script(js_fetch_one_by_hash(), e["hash"], e["name"])
+    if not d.get("ok"):
+        print(f"[warn] fetch failed for {e['name']}: {d}")
+        return None
+    fname = re.sub(r'[\\/:*?"<>|]+', '_', d["name"])
+    gz_bytes = gzip.compress(d["text"].encode("utf-8"))
+    resp = upload_log_to_drive(fname, d["text"], day, gz_bytes=gz_bytes)
+    print(f"{label}uploaded {fname} → {resp}")
+    if not resp.get("ok"):
+        return None
+    if bundle is not None:
+        bundle.add(gz_name_for(fname), gz_bytes)
+    # counters are computed here, while the text is already in memory
+    return index_entry(gz_name_for(fname), d["text"], len(gz_bytes))
+
+def count_entry(drv, e: dict, label: str = "") -> dict | None:
+    """Counts-only: the page fetches and counts one listed file; returns its small record (None on failure)."""
+    d = drv.execute_async_script(js_fetch_one_by_hash(counts_only=True), e["hash"], e["name"])
+    if not d.get("ok"):
+        print(f"[warn] count failed for {e['name']}: {d}")
+        return None
+    name = re.sub(r'[\\/:*?"<>|]+', '_', d["name"])
+    rec = {"name": name, "feedId": file_feed_id(name), "size": d["size"], "sha": d["sha"],
+           "latest": d["latest"], "totals": d["totals"], "partner": d["partner"]}
+    print(f"{label}counted {name}: {rec['totals']} latest={rec['latest']}")
+    return rec
+
+def publish_counts(day: str, records: list[dict], listed: int) -> None:
+    """Post the day totals and the per-partner rows straight from counts-only records."""
+    import summarize_log_counts as S
+    import summarize_log_counts_by_partner as P
+    missed = max(0, listed - len(records))
+    if config.flag("PREVIEW_ONLY"):
+        print(f"[dry-run] would post totals + {len(records)} partner rows for {day} ({missed} not counted)")
+        return
+    S.post_day_totals(day, {r["name"]: index_counts(r, "totals") for r in records}, listed, missed)
+    partner = {r["feedId"]: r["partner"] for r in records if r["feedId"] is not None}
+    if partner:
+        P.write_results(day, partner, clear_first=config.flag("CLEAR_FIRST"))
+
+def upload_index(day: str, entries: list[dict]) -> dict:
+    resp = upload_bytes_to_drive(INDEX_NAME, encode_index(day, entries), "application/gzip", day)
+    print(f"[index] {INDEX_NAME}: {len(entries)} files → {resp}")
+    return resp
+
+def upload_bundle(day: str, bundle: BundleWriter) -> dict:
+    """One _bundle.gz with every archived member; skipped above LOGS_BUNDLE_MAX (single-upload limit)."""
+    if bundle.over_cap:
+        print(f"[bundle] {BUNDLE_NAME}: {bundle.size} bytes > LOGS_BUNDLE_MAX={bundle.cap}, not uploaded")
+        return {"ok": False, "skipped": "too large"}
+    data = bundle.encode(day)
+    resp = upload_bytes_to_drive(BUNDLE_NAME, data, "application/gzip", day)
+    print(f"[bundle] {BUNDLE_NAME}: {len(bundle.files)} files, {len(data)} bytes → {resp}")
+    return resp
+
 # ----- main -----
-def main():
+def main(day: str | None = None, counts_only: bool | None = None) -> dict:
+    """
+    Archive one day's logs; returns {"day", "index"} (index entries by archived name) for in-process callers.
+    counts_only (or COUNTS_ONLY=1): nothing is archived; the page counts each file and the
+    totals / per-partner rows are posted from those records ({"day", "index": None, "counts"}).
+    """
+    if counts_only is None:
+        counts_only = config.flag("COUNTS_ONLY")
+    check_env()
+    if counts_only and not config.flag("PREVIEW_ONLY"):
+        config.require("LOGS_WRITER_URL")
     drv = driver()
     try:
-        # login
-        drv.get(LOGIN_URL)
-        WebDriverWait(drv, 20).until(EC.presence_of_element_located((By.NAME, "data[username]")))
-        drv.find_element(By.NAME, "data[username]").send_keys(PORTAL_USER)
-        drv.find_element(By.NAME, "data[password]").send_keys(PORTAL_PASS)
-        drv.find_element(By.ID, "login-submit").click()
-        WebDriverWait(drv, 20).until(EC.url_contains("gestionale"))
-
-        # goto elFinder logs
-        href = LOGS_URL if LOGS_URL.startswith("http") else urljoin(origin(LOGIN_URL), "/gestionale/elfinder/?log")
-        drv.get(href)
-        try:
-            WebDriverWait(drv, 5).until(EC.title_contains("Dashboard"))
-            links = drv.find_elements(By.CSS_SELECTOR, "a[href*='elfinder/?log']")
-            if links: drv.execute_script("arguments[0].click()", links[0])
-        except Exception:
-            pass
-        wait_for_elfinder(drv)
-
-        # list
-        res = drv.execute_async_script(js_list_logs_for_cwd())
-        if not res.get("ok"): raise RuntimeError(res)
-        latest_day = res["latestDay"]
-        entries = res["entries"]
+        waits = Waits()
+        open_logs_browser(drv, waits)
+        waits.report("logs")
 
-        day = LOGS_DATE or latest_day
+        # list (only the target day's entries come back)
+        day, targets = list_day_entries(drv, day or config.env("LOGS_DATE") or None)
         if not day:
             raise SystemExit("No logs found in the folder.")
 
-        # pick all files for that day (prefer name prefix, else ts)
-        def day_of(e):
-            if e.get("dateFromName"): return e["dateFromName"]
-            ts = e.get("ts") or 0
-            if not ts: return None
-            return datetime.fromtimestamp(ts, tz=timezone.utc).astimezone(TZ).date().isoformat()
-
-        targets = [e for e in entries if day_of(e) == day]
-        targets.sort(key=lambda e: e["name"])
-
-        print(f"[info] Day={day} files={len(targets)}")
+        print(f"[info] Day={day} files={len(targets)}" + (" (counts only)" if counts_only else ""))
+        if counts_only:
+            records = []
+            for i, e in enumerate(targets, 1):
+                rec = count_entry(drv, e, label=f"[{i}/{len(targets)}] ")
+                if rec:
+                    records.append(rec)
+            publish_counts(day, records, len(targets))
+            return {"day": day, "index": None, "counts": records}
+
+        index_entries = []
+        bundle = BundleWriter(int(config.num("LOGS_BUNDLE_MAX", 30_000_000))) \
+            if config.flag("LOGS_BUNDLE", True) else None
         for i, e in enumerate(targets, 1):
-            name_hash = e["hash"]
-            d = drv.execute_async_script(js_fetch_one_by_hash(), name_hash)
-            if not d.get("ok"):
-                print(f"[warn] fetch failed for {e['name']}: {d}")
-                continue
-            fname = re.sub(r'[\\/:*?"<>|]+', '_', d["name"])
-            resp = upload_log_to_drive(fname, d["text"], day)
-            print(f"[{i}/{len(targets)}] uploaded {fname} → {resp}")
+            entry = archive_entry(drv, e, day, label=f"[{i}/{len(targets)}] ", bundle=bundle)
+            if entry:
+                index_entries.append(entry)
+
+        if index_entries:
+            upload_index(day, index_entries)
+        if bundle is not None:
+            if bundle.files or bundle.over_cap:
+                upload_bundle(day, bundle)
+            bundle.close()
+        return {"day": day, "index": {e["name"]: e for e in index_entries}}
     finally:
         drv.quit()
 
 if __name__ == "__main__":
-    main()
+    from profiling import profiled
+    profiled(main)()
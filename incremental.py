@@ -0,0 +1,164 @@
+# incremental.py
+"""
+Per-file incremental state for the intraday summarizer runs.
+
+For every (day, filename) we remember:
+  offset   end of the last complete line already counted (bytes of the decompressed log)
+  sha      sha1 of the first HEAD_BYTES of the content (16 hex) — detects rewritten files
+  mark     sha1 of the MARK_BYTES just before offset — checks the seam where new data starts
+  counts   counters for content[:offset]
+  fp       listLogs fingerprint (size / lastUpdated) — unchanged files are not fetched at all
+
+Later runs only count content[offset:]. If either hash no longer matches the file
+was rewritten and it is reparsed from byte 0.
+
+Tail-only transfer: fetchers send {"fromOffsets": {name: offset - MARK_BYTES}} in
+getLogsBatch. A web app that supports it answers with the plain (not gzipped)
+bytes from that offset and echoes "fromOffset"; the overlap is checked against
+mark. Apps that ignore the hint return the whole file as usual.
+
+State lives in INCREMENTAL_DIR (default .state/incremental/<kind>/<day>.json).
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import config
+
+SHA_LEN = 16
+HEAD_BYTES = 4096
+MARK_BYTES = 1024
+
+
+def short_sha(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:SHA_LEN]
+
+
+def fingerprint(meta: dict | None) -> list | None:
+    """listLogs entry → comparable fingerprint, or None when it carries nothing usable."""
+    if not meta:
+        return None
+    fp = [meta.get("size"), meta.get("lastUpdated")]
+    return fp if any(v is not None for v in fp) else None
+
+
+def merge_counts(a: dict, b: dict) -> dict:
+    """Sum integer counters; 'latest' keeps the newest datetime."""
+    out = dict(a)
+    for k, v in b.items():
+        if k == "latest":
+            out[k] = max((x for x in (a.get(k), v) if x is not None), default=None)
+        else:
+            out[k] = out.get(k, 0) + v
+    return out
+
+
+def _dump_counts(c: dict) -> dict:
+    return {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in c.items()}
+
+
+def _load_counts(c: dict) -> dict:
+    return {k: (datetime.fromisoformat(v) if k == "latest" and v else v) for k, v in c.items()}
+
+
+class IncrementalState:
+    def __init__(self, kind: str, day: str, root: str | os.PathLike | None = None):
+        base = Path(root or config.env("INCREMENTAL_DIR", ".state/incremental"))
+        self.path = base / kind / f"{day}.json"
+        self.files: dict[str, dict] = {}
+        self.stats = {"skipped": 0, "tail": 0, "full": 0}
+        self.refetch: list[str] = []
+        if self.path.exists():
+            try:
+                raw = json.loads(self.path.read_text(encoding="utf-8"))
+                self.files = {n: {**e, "counts": _load_counts(e.get("counts", {})),
+                                  "tail_counts": _load_counts(e.get("tail_counts", {}))}
+                              for n, e in raw.get("files", {}).items()}
+            except Exception:
+                self.files = {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        body = {"files": {n: {**e, "counts": _dump_counts(e["counts"]),
+                              "tail_counts": _dump_counts(e["tail_counts"])}
+                          for n, e in self.files.items()}}
+        tmp.write_text(json.dumps(body, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def unchanged(self, name: str, meta: dict | None) -> bool:
+        fp = fingerprint(meta)
+        e = self.files.get(name)
+        return bool(fp and e and e.get("fp") == fp)
+
+    def counts(self, name: str) -> dict:
+        """Full-file counters as of the last fold (complete lines + unterminated tail)."""
+        e = self.files[name]
+        return merge_counts(e["counts"], e["tail_counts"])
+
+    def offsets(self, names: list[str]) -> dict[str, int]:
+        """fromOffsets hint for getLogsBatch: where each known file's tail request should start."""
+        out = {}
+        for n in names:
+            off = self.files.get(n, {}).get("offset", 0)
+            if off >= HEAD_BYTES:
+                out[n] = max(0, off - MARK_BYTES)
+        return out
+
+    def skip(self, name: str) -> dict:
+        self.stats["skipped"] += 1
+        return self.counts(name)
+
+    def fold(self, name: str, raw: bytes, count_fn: Callable[[str], dict],
+             item: dict | None = None, meta: dict | None = None) -> dict | None:
+        """
+        Count only what was appended since the last run and return full-file counters.
+        raw is the payload as received (gzip or plain; a tail slice when item has fromOffset).
+        Returns None when a tail slice no longer lines up with the stored state: the
+        entry is dropped and the name queued in self.refetch for a full fetch.
+        """
+        e = self.files.get(name)
+        if raw[:2] == b"\x1f\x8b":
+            raw = gzip.decompress(raw)
+
+        base: dict = {}
+        start = 0
+        shift = int((item or {}).get("fromOffset") or 0)
+        if shift:
+            # content[shift:] only; the overlap up to our offset must match the stored mark
+            seam = e["offset"] - shift if e else -1
+            if seam < 0 or seam > len(raw) or short_sha(raw[:seam]) != e["mark"]:
+                self.files.pop(name, None)
+                self.refetch.append(name)
+                return None
+            start, base = seam, e["counts"]
+        elif e and e["offset"] <= len(raw) \
+                and e["sha"] == short_sha(raw[:min(HEAD_BYTES, e["offset"])]) \
+                and e["mark"] == short_sha(raw[max(0, e["offset"] - MARK_BYTES):e["offset"]]):
+            start, base = e["offset"], e["counts"]
+
+        end = raw.rfind(b"\n", start) + 1 or start
+        done = base
+        if end > start:
+            done = merge_counts(base, count_fn(raw[start:end].decode("utf-8", errors="replace")))
+        rest = raw[end:]
+        tail_counts = count_fn(rest.decode("utf-8", errors="replace")) if rest else {}
+
+        self.stats["tail" if start else "full"] += 1
+        offset = shift + end
+        self.files[name] = {
+            "offset": offset,
+            # tail slices only go out for offsets >= HEAD_BYTES, so the head never moves there
+            "sha": e["sha"] if shift else short_sha(raw[:min(HEAD_BYTES, offset)]),
+            "mark": short_sha(raw[max(0, end - MARK_BYTES):end]),
+            "counts": done,
+            "tail_counts": tail_counts,
+            "fp": fingerprint(meta),
+        }
+        return merge_counts(done, tail_counts)
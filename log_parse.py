@@ -0,0 +1,315 @@
+# log_parse.py
+"""
+Counter / timestamp extraction shared by the summarizers and get_logs_day.
+
+Two counter flavours exist on purpose and must not be mixed:
+  count_log()      daily totals (summarize_log_counts): "(\\d+)" after each label
+  count_partner()  per-partner rows (by-partner script): "[\\d.,]+" with separators stripped
+count_log_bytes() / count_partner_bytes() run the same patterns straight on bytes or mmap;
+ChunkCounter runs them over a file delivered in pieces (ranged downloads).
+"""
+import gzip
+import os
+import re
+import zlib
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+def normalize_text(s: str) -> str:
+    s = re.sub(r"[\u200B\u200C\u200D\u2060\uFEFF]", "", s)
+    s = s.replace("\u00A0", " ")
+    return s
+
+def sum_matches(text: str, pattern: str) -> int:
+    total = 0
+    for m in re.finditer(pattern, text, flags=re.IGNORECASE):
+        try:
+            total += int(m.group(1))
+        except Exception:
+            pass
+    return total
+
+TS_LINE_RX = re.compile(
+    r"^([A-Z][a-z]{2},\s\d{2}\s[A-Z][a-z]{2}\s\d{4}\s\d{2}:\d{2}:\d{2}\s[+-]\d{4})\b",
+    re.MULTILINE
+)
+_MONTHS = {m: i for i, m in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1)}
+TS_LINE_RX_B = re.compile(TS_LINE_RX.pattern.encode("ascii"), re.MULTILINE)
+TAIL_WINDOW = 64 * 1024   # first backwards window; doubled until enough candidates
+TAIL_CONFIRM = 3          # newest N stamps that must be in order to trust the tail
+
+@lru_cache(maxsize=64)
+def _tz_for_offset(off: str) -> timezone:
+    sign = -1 if off[0] == "-" else 1
+    return timezone(sign * timedelta(hours=int(off[1:3]), minutes=int(off[3:5])))
+
+def parse_log_ts(s: str) -> datetime | None:
+    """Parse 'Mon, 01 Sep 2025 12:34:56 +0200' by position (what strptime does, minus the cost)."""
+    try:
+        return datetime(int(s[12:16]), _MONTHS[s[8:11]], int(s[5:7]),
+                        int(s[17:19]), int(s[20:22]), int(s[23:25]),
+                        tzinfo=_tz_for_offset(s[26:31]))
+    except (KeyError, ValueError):
+        return None
+
+def _ts_rx(buf):
+    """Text or bytes flavour of the stamp regex (bytes also covers bytearray / mmap)."""
+    return TS_LINE_RX if isinstance(buf, str) else TS_LINE_RX_B
+
+def _stamp(c) -> datetime | None:
+    return parse_log_ts(c if isinstance(c, str) else c.decode("ascii"))
+
+def _latest_timestamp_full(text) -> datetime | None:
+    best = None
+    for m in _ts_rx(text).finditer(text):
+        dt = _stamp(m.group(1))
+        if dt and (best is None or dt > best):
+            best = dt
+    return best
+
+def _tail_stamps(text, n: int) -> tuple[list[datetime], bool]:
+    """
+    Newest n parseable stamps (oldest first) found by scanning growing windows
+    back from the end. Second item is True when the whole text was covered.
+    Works on str, bytes and mmap alike.
+    """
+    rx = _ts_rx(text)
+    nl = "\n" if isinstance(text, str) else b"\n"
+    window = TAIL_WINDOW
+    while True:
+        cut = len(text) - window
+        start = 0 if cut <= 0 else text.rfind(nl, 0, cut) + 1
+        cands = [m.group(1) for m in rx.finditer(text, start)]
+        stamps: list[datetime] = []
+        for c in reversed(cands):
+            dt = _stamp(c)
+            if dt:
+                stamps.append(dt)
+                if len(stamps) == n:
+                    break
+        if len(stamps) == n or start == 0:
+            return stamps[::-1], start == 0
+        window *= 2
+
+def _in_order(stamps: list[datetime]) -> bool:
+    return all(a <= b for a, b in zip(stamps, stamps[1:]))
+
+def latest_timestamp(text) -> datetime | None:
+    """
+    Newest log timestamp. importDaemon appends in time order, so the last stamp
+    is normally the newest: look at the tail only and fall back to a full scan
+    when the last few stamps are out of order. Accepts str, bytes or mmap.
+    """
+    stamps, whole = _tail_stamps(text, TAIL_CONFIRM)
+    if not stamps:
+        return None
+    if _in_order(stamps):
+        return stamps[-1]
+    return max(stamps) if whole and len(stamps) < TAIL_CONFIRM else _latest_timestamp_full(text)
+
+def latest_timestamp_from_stream(f, block: int = TAIL_WINDOW) -> datetime | None:
+    """
+    Same as latest_timestamp() for a seekable binary file (plain .log on disk):
+    reads blocks backwards from EOF instead of loading the whole file.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    read = min(block, size)
+    while True:
+        f.seek(size - read)
+        buf = f.read(read)
+        if read < size:
+            nl = buf.find(b"\n")
+            buf = buf[nl + 1:] if nl >= 0 else b""
+        stamps, _ = _tail_stamps(buf, TAIL_CONFIRM)
+        if len(stamps) == TAIL_CONFIRM or read == size:
+            break
+        read = min(read * 2, size)
+    if not stamps:
+        return None
+    if _in_order(stamps):
+        return stamps[-1]
+    f.seek(0)
+    return _latest_timestamp_full(f.read())
+
+def bytes_to_text_maybe_gzip(b: bytes) -> str:
+    # gzip magic: 1F 8B
+    if len(b) >= 2 and b[0] == 0x1F and b[1] == 0x8B:
+        try:
+            return gzip.decompress(b).decode("utf-8", errors="replace")
+        except Exception:
+            # fallback if something odd
+            return gzip.decompress(b).decode("latin-1", errors="replace")
+    return b.decode("utf-8", errors="replace")
+PATT_ERR    = r"Prodotti in errore Google\s*:\s*(\d+)"
+PATT_ADD    = r"Prodotti da aggiungere\s*:\s*(\d+)"
+PATT_UPDATE = r"Prodotti da aggiornare su Google\s*:\s*(\d+)"
+
+def count_log(text: str) -> dict:
+    """Reduce one log's text to its counters + newest timestamp."""
+    return {
+        "errore":     sum_matches(text, PATT_ERR),
+        "aggiungere": sum_matches(text, PATT_ADD),
+        "aggiornare": sum_matches(text, PATT_UPDATE),
+        "latest":     latest_timestamp(text),
+    }
+
+RX_ERRI   = r"prodotti\s+in\s+errore\s+google\s*:\s*([\d\.,]+)"
+RX_ADD    = r"prodotti\s+da\s+aggiungere\s*:\s*([\d\.,]+)"
+RX_UPDATE = r"prodotti\s+da\s+aggiornare\s+su\s+google\s*:\s*([\d\.,]+)"
+
+def parse_int(s: str) -> int:
+    return int(re.sub(r"[^\d]", "", s or "") or "0")
+
+def sum_partner_matches(text: str, rx: str) -> int:
+    total = 0
+    for m in re.finditer(rx, text, flags=re.I):
+        total += parse_int(m.group(1))
+    return total
+
+def count_partner(text: str) -> dict:
+    """Reduce one log's text to the per-partner counters."""
+    return {
+        "errore":     sum_partner_matches(text, RX_ERRI),
+        "aggiungere": sum_partner_matches(text, RX_ADD),
+        "aggiornare": sum_partner_matches(text, RX_UPDATE),
+    }
+
+# ---- bytes / mmap flavour: no UTF-8 decode, no normalize_text ----
+def _bytes_rx(pattern: str) -> "re.Pattern[bytes]":
+    # str \s also matches NBSP (U+00A0); in bytes that is the UTF-8 pair C2 A0
+    return re.compile(pattern.replace(r"\s", r"(?:\s|\xc2\xa0)").encode("ascii"), re.IGNORECASE)
+
+PATT_ERR_B, PATT_ADD_B, PATT_UPDATE_B = (_bytes_rx(p) for p in (PATT_ERR, PATT_ADD, PATT_UPDATE))
+RX_ERRI_B, RX_ADD_B, RX_UPDATE_B = (_bytes_rx(p) for p in (RX_ERRI, RX_ADD, RX_UPDATE))
+
+def count_log_bytes(buf) -> dict:
+    """count_log() on raw (decompressed) bytes or an mmap of a plain .log."""
+    return {
+        "errore":     sum(int(m.group(1)) for m in PATT_ERR_B.finditer(buf)),
+        "aggiungere": sum(int(m.group(1)) for m in PATT_ADD_B.finditer(buf)),
+        "aggiornare": sum(int(m.group(1)) for m in PATT_UPDATE_B.finditer(buf)),
+        "latest":     latest_timestamp(buf),
+    }
+
+def count_partner_bytes(buf) -> dict:
+    """count_partner() on raw (decompressed) bytes or an mmap of a plain .log."""
+    def total(rx):
+        return sum(int(re.sub(rb"[^\d]", b"", m.group(1)) or b"0") for m in rx.finditer(buf))
+    return {
+        "errore":     total(RX_ERRI_B),
+        "aggiungere": total(RX_ADD_B),
+        "aggiornare": total(RX_UPDATE_B),
+    }
+
+def file_feed_id(filename: str) -> int | None:
+    # e.g., 2025-09-01_importDaemon_feed_442.log or .log.gz
+    m = re.search(r"feed[_-](\d+)\.log(?:\.gz)?$", filename)
+    return int(m.group(1)) if m else None
+
+# ---- chunked flavour: same counters fed piece by piece (ranged downloads) ----
+MATCH_OVERLAP = 4096      # bytes kept back for a label/number pair split across chunks
+INFLATE_STEP = 4 * 1024 * 1024
+
+class ChunkCounter:
+    """
+    count_log_bytes() / count_partner_bytes() over a log delivered in pieces.
+
+    feed() takes the stored bytes in order (gzip is inflated on the fly, multi-member
+    included); only a small carry — the unfinished last line plus MATCH_OVERLAP bytes
+    for a label split from its number — is held between pieces, so memory stays
+    bounded by the piece size. Matches and stamps are counted exactly once: each
+    pattern keeps the absolute end of its last counted match, and stamp lines are
+    only read once their newline has arrived. result() returns the same counters as
+    the one-shot functions. "latest" is the max over every stamp line, as in
+    _latest_timestamp_full(). latest_timestamp() only agrees when its tail check falls
+    back to the full scan, or when the last stamp is also the newest (the usual append
+    order). If the last TAIL_CONFIRM stamps are in order but an earlier line is newer,
+    it returns the last stamp and ChunkCounter the newer one.
+    """
+
+    def __init__(self, kind: str = "totals"):
+        if kind not in ("totals", "partner"):
+            raise ValueError(f"kind must be totals|partner, got {kind!r}")
+        self.kind = kind
+        if kind == "totals":
+            self._rx = {"errore": PATT_ERR_B, "aggiungere": PATT_ADD_B, "aggiornare": PATT_UPDATE_B}
+        else:
+            self._rx = {"errore": RX_ERRI_B, "aggiungere": RX_ADD_B, "aggiornare": RX_UPDATE_B}
+        self.counts = dict.fromkeys(self._rx, 0)
+        self.latest: datetime | None = None
+        self.bytes_in = 0           # stored (possibly gzipped) bytes fed
+        self._buf = b""
+        self._base = 0              # absolute offset of _buf[0] in the plain text
+        self._done = dict.fromkeys(self._rx, 0)
+        self._ts_done = 0
+        self._inflate = None
+        self._sniffed = False
+        self._head = b""
+
+    def _value(self, m) -> int:
+        if self.kind == "totals":
+            return int(m.group(1))
+        return int(re.sub(rb"[^\d]", b"", m.group(1)) or b"0")
+
+    def _scan(self, final: bool) -> None:
+        buf, base = self._buf, self._base
+        end = len(buf)
+        keep = end
+        for key, rx in self._rx.items():
+            for m in rx.finditer(buf, max(0, self._done[key] - base)):
+                # a match touching the end may still grow (more digits in the next piece)
+                if m.end() >= end and not final:
+                    break
+                self.counts[key] += self._value(m)
+                self._done[key] = base + m.end()
+            keep = min(keep, max(self._done[key] - base, end - MATCH_OVERLAP, 0))
+        nl = end if final else buf.rfind(b"\n") + 1
+        if nl > self._ts_done - base:
+            for m in TS_LINE_RX_B.finditer(buf, max(0, self._ts_done - base), nl):
+                dt = _stamp(m.group(1))
+                if dt and (self.latest is None or dt > self.latest):
+                    self.latest = dt
+            self._ts_done = base + nl
+        keep = min(keep, self._ts_done - base)
+        self._buf = buf[keep:]
+        self._base = base + keep
+
+    def _push(self, plain: bytes) -> None:
+        if plain:
+            self._buf += plain
+            self._scan(final=False)
+
+    def feed(self, data: bytes) -> None:
+        self.bytes_in += len(data)
+        if not self._sniffed:
+            data = self._head + data
+            if len(data) < 2:
+                self._head = data
+                return
+            self._sniffed = True
+            if data[:2] == b"\x1f\x8b":
+                self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._inflate is None:
+            self._push(data)
+            return
+        while data:
+            out = self._inflate.decompress(data, INFLATE_STEP)
+            self._push(out)
+            if self._inflate.eof:
+                # next gzip member (if any) starts in unused_data
+                data = self._inflate.unused_data
+                self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = self._inflate.unconsumed_tail
+
+    def result(self) -> dict:
+        if not self._sniffed and self._head:
+            self._sniffed = True
+            self._buf += self._head
+        self._scan(final=True)
+        out = dict(self.counts)
+        if self.kind == "totals":
+            out["latest"] = self.latest
+        return out
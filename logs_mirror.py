@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# logs_mirror.py — local mirror of Drive LogsArchive/YYYY-MM-DD/ for backfills and ad-hoc reprocessing
+"""
+sync       pull changed/missing logs for a date range (listLogs size/lastUpdated vs a per-day
+           .manifest.json): from the day's _bundle.gz in a few ranged reads where it is
+           current, else in getLogsBatch chunks; --decompress stores plain .log files
+summarize  recount a date range from disk only: plain .log files are mmapped and scanned
+           as bytes (no UTF-8 decode), .log.gz are gunzipped in memory; one JSON line per day
+
+ENV:
+  WEBAPP_URL=...          (sync / --post-totals only)
+  LOGS_FOLDER=LogsArchive (optional)
+  MIRROR_DIR=./LogsArchive
+
+CLI:
+  python logs_mirror.py sync --from 2025-08-01 --to 2025-09-30 --decompress
+  python logs_mirror.py summarize --from 2025-08-01 --to 2025-09-30 --workers 4 > backfill.jsonl
+"""
+import argparse
+import base64
+import gzip
+import json
+import mmap
+import os
+import re
+import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import config
+from day_bundle import BUNDLE_NAME, fetch_members
+from day_index import INDEX_NAME
+from incremental import fingerprint
+from log_parse import count_log_bytes, count_partner_bytes, file_feed_id
+
+MAX_PER_CALL = 30  # Apps Script getLogsBatch cap
+MANIFEST = ".manifest.json"
+
+
+def log(*a): print("[mirror]", *a, flush=True)
+
+
+def day_range(start: str, end: str) -> list[str]:
+    d0, d1 = dt.date.fromisoformat(start), dt.date.fromisoformat(end)
+    return [(d0 + dt.timedelta(days=i)).isoformat() for i in range((d1 - d0).days + 1)]
+
+
+def mirror_root() -> Path:
+    return Path(config.env("MIRROR_DIR", "LogsArchive"))
+
+
+# ---- sync ----
+def _post(url: str, payload: dict, timeout=(15, 180)) -> dict:
+    import webapp_client as webapp
+    r = webapp.post(url, json=payload, timeout=timeout)
+    r.raise_for_status()
+    return r.json()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def sync_day(url: str, folder: str, day: str, decompress: bool) -> dict:
+    res = _post(url, {"listLogs": {"folderName": folder, "date": day}}, timeout=120)
+    listed = res.get("files", []) if res.get("ok") else []
+    metas = {f["name"]: f for f in listed if re.search(r"\.log(\.gz)?$", str(f.get("name", "")))}
+    has_bundle = any(f.get("name") == BUNDLE_NAME for f in listed)
+    out = mirror_root() / day
+    man_path = out / MANIFEST
+    manifest = json.loads(man_path.read_text(encoding="utf-8")) if man_path.exists() else {}
+
+    todo = []
+    for name, meta in metas.items():
+        have = manifest.get(name)
+        if have and (out / have["local"]).exists() and \
+                (fingerprint(meta) is None or have.get("fp") == fingerprint(meta)):
+            continue
+        todo.append(name)
+
+    pruned = 0
+    for name in [n for n in manifest if n not in metas]:
+        (out / manifest.pop(name)["local"]).unlink(missing_ok=True)
+        pruned += 1
+
+    def store(name: str, raw: bytes) -> None:
+        local = name
+        if decompress:
+            if raw[:2] == b"\x1f\x8b":
+                raw = gzip.decompress(raw)
+            local = name[:-3] if name.endswith(".gz") else name
+        old = manifest.get(name, {}).get("local")
+        _write_atomic(out / local, raw)
+        if old and old != local:
+            (out / old).unlink(missing_ok=True)
+        manifest[name] = {"local": local, "fp": fingerprint(metas[name])}
+
+    missing, bundled = [], 0
+    if todo:
+        out.mkdir(parents=True, exist_ok=True)
+    if todo and has_bundle:
+        try:
+            members = fetch_members(lambda p: _post(url, p), day, [metas[n] for n in todo], folder)
+        except Exception as e:
+            log(f"{day}: {BUNDLE_NAME} unusable ({e}), fetching file by file")
+            members = {}
+        for name, raw in members.items():
+            store(name, raw)
+        bundled = len(members)
+        todo_rest = [n for n in todo if n not in members]
+    else:
+        todo_rest = todo
+    for i in range(0, len(todo_rest), MAX_PER_CALL):
+        chunk = todo_rest[i:i + MAX_PER_CALL]
+        r = _post(url, {"getLogsBatch": {"folderName": folder, "date": day, "filenames": chunk}})
+        got = set()
+        for item in r.get("files", []):
+            name = item.get("name")
+            if not item.get("ok") or name not in metas:
+                continue
+            store(name, base64.b64decode(item.get("contentBase64") or ""))
+            got.add(name)
+        missing += [n for n in chunk if n not in got]
+
+    if todo or pruned:
+        _write_atomic(man_path, json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+    return {"day": day, "listed": len(metas), "fetched": len(todo) - len(missing),
+            "bundled": bundled, "missing": missing, "pruned": pruned}
+
+
+# ---- reprocess ----
+def scan_file(path: Path) -> tuple[dict, dict]:
+    """(totals counters, partner counters) for one mirrored file; plain logs are mmapped."""
+    if path.suffix == ".gz":
+        buf = gzip.decompress(path.read_bytes())
+        return count_log_bytes(buf), count_partner_bytes(buf)
+    if path.stat().st_size == 0:
+        return count_log_bytes(b""), count_partner_bytes(b"")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return count_log_bytes(mm), count_partner_bytes(mm)
+
+
+def summarize_day(day: str) -> dict:
+    d = mirror_root() / day
+    tot = {"errore": 0, "aggiungere": 0, "aggiornare": 0}
+    partners: dict[int, dict] = {}
+    latest = None
+    files = sorted(p for p in d.glob("*.log*") if p.name != INDEX_NAME and re.search(r"\.log(\.gz)?$", p.name)) \
+        if d.is_dir() else []
+    for p in files:
+        t, pc = scan_file(p)
+        for k in tot:
+            tot[k] += t[k]
+        if t["latest"] and (latest is None or t["latest"] > latest):
+            latest = t["latest"]
+        fid = file_feed_id(p.name)
+        if fid is not None:
+            partners[fid] = pc
+    return {"day": day, "files": len(files), **tot,
+            "latest": latest.isoformat() if latest else None, "partners": partners}
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("sync", "summarize"):
+        sp = sub.add_parser(name)
+        sp.add_argument("--from", dest="start", required=True, help="YYYY-MM-DD")
+        sp.add_argument("--to", dest="end", help="YYYY-MM-DD (default: same as --from)")
+    sub.choices["sync"].add_argument("--decompress", action="store_true", help="store plain .log (mmap-able)")
+    sub.choices["summarize"].add_argument("--workers", type=int, default=1, help="days processed in parallel")
+    sub.choices["summarize"].add_argument("--post-totals", action="store_true",
+                                          help="also POST logCounters per day to WEBAPP_URL")
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    days = day_range(args.start, args.end or args.start)
+    folder = config.env("LOGS_FOLDER", "LogsArchive")
+
+    if args.cmd == "sync":
+        url = config.require("WEBAPP_URL")
+        for day in days:
+            r = sync_day(url, folder, day, args.decompress)
+            log(f"{day}: listed={r['listed']} fetched={r['fetched']} (bundle {r['bundled']}) pruned={r['pruned']} "
+                f"missing={len(r['missing'])}" + (f" e.g. {r['missing'][:3]}" if r["missing"] else ""))
+        return
+
+    url = config.require("WEBAPP_URL") if args.post_totals else ""
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            results = list(ex.map(summarize_day, days))
+    else:
+        results = map(summarize_day, days)
+    for res in results:
+        print(json.dumps(res, separators=(",", ":")), flush=True)
+        if url and res["files"]:
+            _post(url, {"logCounters": {"date": res["day"], "errore": res["errore"],
+                                        "aggiungere": res["aggiungere"], "aggiornare": res["aggiornare"]}},
+                  timeout=60)
+
+
+if __name__ == "__main__":
+    from profiling import profiled
+    profiled(main)()
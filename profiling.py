@@ -0,0 +1,169 @@
+# profiling.py
+"""
+Opt-in CPU / memory profiling for the entry points.
+
+Turn it on with either:
+  PROFILE=cpu,mem            (env; "1"/"all" means both)
+  --profile[=cpu,mem]        (CLI; stripped from sys.argv before main() runs)
+  --profile cpu,mem          (the next argument only counts when it is all kinds, so
+                              "cli.py --profile get-logs-day" keeps its subcommand)
+
+Artifacts land in PROFILE_DIR (default ./artifacts/profile/<script>-<UTC stamp>/):
+  cpu.pstats        cProfile stats (python -m pstats cpu.pstats)
+  cpu_top.txt       top-N functions by cumulative time
+  cpu.collapsed     sampled stacks, one "a;b;c count" per line (flamegraph.pl / speedscope)
+  mem_top.txt       top-N allocation sites from a tracemalloc snapshot
+
+When neither switch is set, profiled(main) returns main untouched.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from typing import Callable
+
+import config
+
+PROFILE_KINDS = ("cpu", "mem")
+
+
+def _parse_kinds(spec: str) -> set[str]:
+    s = spec.strip().lower()
+    if not s or s in ("0", "false", "no", "off"):
+        return set()
+    if s in ("1", "true", "yes", "y", "all"):
+        return set(PROFILE_KINDS)
+    kinds = {k.strip() for k in s.split(",") if k.strip()}
+    unknown = kinds - set(PROFILE_KINDS)
+    if unknown:
+        print(f"[profile] ignoring unknown kind(s) {','.join(sorted(unknown))} "
+              f"(expected {','.join(PROFILE_KINDS)} or all)", flush=True)
+    return kinds & set(PROFILE_KINDS)
+
+
+def _only_kinds(spec: str) -> bool:
+    """True when spec is "all" or a comma list of PROFILE_KINDS only."""
+    parts = [k.strip() for k in spec.lower().split(",")]
+    return spec.strip().lower() == "all" or all(k in PROFILE_KINDS for k in parts)
+
+
+def _pop_cli_flag(argv: list[str]) -> str | None:
+    """Remove --profile / --profile=X / --profile KINDS from argv, return its value (or None)."""
+    for i, a in enumerate(argv):
+        if a == "--profile":
+            nxt = argv[i + 1] if i + 1 < len(argv) else ""
+            if nxt and _only_kinds(nxt):
+                del argv[i:i + 2]
+                return nxt
+            del argv[i]
+            return "all"
+        if a.startswith("--profile="):
+            del argv[i]
+            return a.split("=", 1)[1]
+    return None
+
+
+class _StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._t = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                co = frame.f_code
+                stack.append(f"{Path(co.co_filename).name}:{co.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._t.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._t.join()
+
+    def write(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+def artifacts_dir(name: str) -> Path:
+    root = Path(config.env("PROFILE_DIR", "artifacts/profile"))
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out = root / f"{name}-{stamp}"
+    out.mkdir(parents=True, exist_ok=True)
+    return out
+
+
+def run_profiled(fn: Callable, kinds: set[str], name: str, *args, **kwargs):
+    import cProfile
+    import io
+    import pstats
+    import tracemalloc
+
+    top_n = config.num("PROFILE_TOP", 40)
+    out = artifacts_dir(name)
+    prof = sampler = None
+    if "mem" in kinds:
+        tracemalloc.start(config.num("PROFILE_MEM_FRAMES", 10))
+    if "cpu" in kinds:
+        sampler = _StackSampler(threading.get_ident(), config.num("PROFILE_SAMPLE_S", 0.005))
+        sampler.start()
+        prof = cProfile.Profile()
+        prof.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        if prof is not None:
+            prof.disable()
+            sampler.stop()
+            prof.dump_stats(out / "cpu.pstats")
+            buf = io.StringIO()
+            pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(top_n)
+            (out / "cpu_top.txt").write_text(buf.getvalue(), encoding="utf-8")
+            sampler.write(out / "cpu.collapsed")
+        if "mem" in kinds:
+            snap = tracemalloc.take_snapshot()
+            cur, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snap = snap.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            lines = [f"current={cur / 1e6:.1f}MB peak={peak / 1e6:.1f}MB", ""]
+            for st in snap.statistics("traceback")[:top_n]:
+                lines.append(f"{st.size / 1024:.1f} KiB in {st.count} blocks")
+                lines.extend("    " + ln for ln in st.traceback.format())
+            (out / "mem_top.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        print(f"[profile] {','.join(sorted(kinds))} → {out}", flush=True)
+
+
+def profiled(fn: Callable, name: str | None = None) -> Callable:
+    """
+    Wrap an entry point so PROFILE / --profile turn on cProfile and/or tracemalloc.
+    Returns fn unchanged when profiling is off.
+    """
+    cli = _pop_cli_flag(sys.argv)
+    kinds = _parse_kinds(cli if cli is not None else config.env("PROFILE"))
+    if not kinds:
+        return fn
+    label = name or Path(sys.argv[0]).stem or fn.__name__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        return run_profiled(fn, kinds, label, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# ranged_fetch.py — fetch and count logs too large for one getLogsBatch / getLatestLog response
+"""
+Web-app protocol (one more action next to listLogs / getLogsBatch):
+
+  {"getLogRange": {"folderName": "LogsArchive", "date": "YYYY-MM-DD",
+                   "filename": "..._feed_442.log.gz", "offset": 0, "length": 8388608}}
+  → {"ok": true, "name": "...", "size": <stored bytes>, "offset": 0,
+     "length": <bytes returned>, "contentBase64": "..."}
+
+Offsets are in stored bytes (gzip as archived). Pieces are fed to
+log_parse.ChunkCounter, which inflates and counts on the fly, so a
+multi-hundred-MB log is summarized holding one piece at a time.
+
+Summarizers send files whose listLogs size is above LOG_RANGE_THRESHOLD here
+directly, and retry batch misses here before giving up on them.
+
+ENV:
+  LOG_RANGE_THRESHOLD=25000000   stored bytes above which a file is not batched
+  LOG_RANGE_CHUNK=8388608        bytes per getLogRange call
+
+Local stand-in (serves a LogsArchive/ tree, e.g. a logs_mirror.py sync, over the
+same JSON protocol; getLogsBatch refuses files above --batch-cap like the real one):
+  python ranged_fetch.py serve --root ./LogsArchive --port 8765 --batch-cap 25000000
+  WEBAPP_URL=http://127.0.0.1:8765 LOGS_WRITER_URL=http://127.0.0.1:8765 python summarize_log_counts.py
+"""
+import argparse
+import base64
+import json
+import re
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+import config
+from log_parse import ChunkCounter
+
+
+def log(*a): print("[ranged]", *a, flush=True)
+
+
+def range_threshold() -> int:
+    return config.num("LOG_RANGE_THRESHOLD", 25000000)
+
+
+def range_chunk() -> int:
+    return config.num("LOG_RANGE_CHUNK", 8 * 1024 * 1024)
+
+
+class RangeUnsupported(RuntimeError):
+    """The web app has no getLogRange action."""
+
+
+_unsupported = False  # set once per process by the first such reply
+
+
+def unsupported_reply(r: dict) -> bool:
+    """True for an answer from a web app without getLogRange (ignored, or unknown action)."""
+    if r.get("ok"):
+        return "size" not in r
+    return bool(re.search(r"unknown|unsupported|not supported|invalid action", str(r.get("error", "")), re.I))
+
+
+def is_large(meta: dict) -> bool:
+    """True when listLogs reports a size above LOG_RANGE_THRESHOLD."""
+    try:
+        return int(meta.get("size") or 0) > range_threshold()
+    except (TypeError, ValueError):
+        return False
+
+
+def iter_log_range(post: Callable[[dict], dict], day: str, filename: str,
+                   folder: str = "LogsArchive", chunk: int | None = None,
+                   attempts: int = 3) -> Iterator[bytes]:
+    """
+    Yield the stored bytes of one file, chunk by chunk, via getLogRange.
+    post(payload) -> parsed JSON. Only transport errors (post raising) are retried, from
+    the piece's own offset; a reply is final, and one saying the action doesn't exist
+    turns ranged reads off for the rest of the process (RangeUnsupported).
+    """
+    global _unsupported
+    if _unsupported:
+        raise RangeUnsupported("getLogRange not supported by the web app")
+    chunk = chunk or range_chunk()
+    offset, size = 0, None
+    while size is None or offset < size:
+        body = {"folderName": folder, "date": day, "filename": filename, "offset": offset, "length": chunk}
+        for attempt in range(1, attempts + 1):
+            try:
+                r = post({"getLogRange": body})
+                break
+            except Exception as e:
+                if attempt == attempts:
+                    raise RuntimeError(f"getLogRange {day}/{filename} @{offset}: {e!r}") from e
+                time.sleep(attempt)
+        if unsupported_reply(r):
+            _unsupported = True
+            log("the web app has no getLogRange action; ranged reads are off for this run")
+            raise RangeUnsupported(f"getLogRange: {str(r)[:200]}")
+        if not r.get("ok") or int(r.get("offset", -1)) != offset:
+            raise RuntimeError(f"getLogRange {day}/{filename} @{offset} failed: {str(r)[:300]}")
+        size = int(r["size"])
+        piece = base64.b64decode(r.get("contentBase64") or "")
+        if not piece and offset < size:
+            raise RuntimeError(f"getLogRange {day}/{filename} @{offset}: empty piece before EOF ({size})")
+        offset += len(piece)
+        yield piece
+
+
+def count_ranged(post: Callable[[dict], dict], day: str, filename: str, kind: str,
+                 folder: str = "LogsArchive", chunk: int | None = None) -> dict:
+    """count_log() ('totals') or count_partner() ('partner') result for one file, fetched in pieces."""
+    chunk = chunk or range_chunk()
+    c = ChunkCounter(kind)
+    t0 = time.perf_counter()
+    for piece in iter_log_range(post, day, filename, folder, chunk):
+        c.feed(piece)
+    log(f"{day}/{filename}: {c.bytes_in / 1e6:.1f} MB in pieces of {chunk / 1e6:.1f} MB, "
+        f"{time.perf_counter() - t0:.1f}s")
+    return c.result()
+
+
+def count_ranged_many(post: Callable[[dict], dict], day: str, filenames: list[str], kind: str,
+                      folder: str = "LogsArchive", on_counts: Callable[[str, dict], None] | None = None) -> list[str]:
+    """count_ranged() for each name; on_counts(name, counters) per success. Returns the failures."""
+    failed = []
+    for i, name in enumerate(filenames):
+        try:
+            c = count_ranged(post, day, name, kind, folder)
+        except RangeUnsupported:
+            failed += filenames[i:]
+            break
+        except Exception as e:
+            log(f"{day}/{name}: {e}")
+            failed.append(name)
+            continue
+        if on_counts is not None:
+            on_counts(name, c)
+    return failed
+
+
+# ---- local stand-in for the web app ----
+def make_handler(root: Path, batch_cap: int):
+    from http.server import BaseHTTPRequestHandler
+    def listing(folder: str, day: str) -> list[Path]:
+        d = root / day
+        return sorted(p for p in d.iterdir() if p.is_file() and not p.name.startswith(".")) if d.is_dir() else []
+
+    def item(p: Path) -> dict:
+        if p.stat().st_size > batch_cap:
+            return {"name": p.name, "ok": False, "error": "too large for one response"}
+        return {"name": p.name, "ok": True, "contentBase64": base64.b64encode(p.read_bytes()).decode("ascii")}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            action, a = next(iter(body.items()), ("", {}))
+            day = str(a.get("date", ""))
+            if action == "listLogs":
+                out = {"ok": True, "files": [{"name": p.name, "size": p.stat().st_size,
+                                              "lastUpdated": int(p.stat().st_mtime * 1000)}
+                                             for p in listing(a.get("folderName", ""), day)]}
+            elif action == "getLogsBatch":
+                out = {"ok": True, "files": [item(root / day / n) if (root / day / n).is_file()
+                                             else {"name": n, "ok": False, "error": "not found"}
+                                             for n in a.get("filenames", [])]}
+            elif action == "getLatestLog":
+                p = root / day / str(a.get("filename", ""))
+                out = item(p) if p.is_file() else {"ok": False, "error": "not found"}
+            elif action == "getLogRange":
+                p = root / day / str(a.get("filename", ""))
+                if not p.is_file():
+                    out = {"ok": False, "error": "not found"}
+                else:
+                    off, length = int(a.get("offset", 0)), int(a.get("length", range_chunk()))
+                    with open(p, "rb") as f:
+                        f.seek(off)
+                        piece = f.read(length)
+                    out = {"ok": True, "name": p.name, "size": p.stat().st_size, "offset": off,
+                           "length": len(piece), "contentBase64": base64.b64encode(piece).decode("ascii")}
+            else:
+                out = {"ok": True, "ignored": action}
+            data = json.dumps(out).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            log("serve:", fmt % args)
+
+    return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("serve", help="local stand-in for the web app over a LogsArchive/ tree")
+    sp.add_argument("--root", default=config.env("MIRROR_DIR", "LogsArchive"))
+    sp.add_argument("--port", type=int, default=8765)
+    sp.add_argument("--batch-cap", type=int, default=range_threshold(),
+                    help="getLogsBatch/getLatestLog refuse files above this many bytes")
+    args = ap.parse_args()
+    from http.server import ThreadingHTTPServer
+    srv = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(Path(args.root), args.batch_cap))
+    log(f"serving {args.root} on http://127.0.0.1:{args.port} (batch cap {args.batch_cap} bytes)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    from profiling import profiled
+    profiled(main)()
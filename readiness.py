@@ -0,0 +1,203 @@
+# readiness.py — event-driven page readiness for the Selenium scrapers (no sleep polling)
+"""
+Each wait is one execute_async_script whose promise resolves when the page signals
+readiness, so no time is lost between the event and the next step:
+
+  wait_for_selector(drv, css)      element present (MutationObserver, or already there)
+  wait_for_datatable(drv, css)     DataTables table initialised: 'init.dt' (or already
+                                   complete); plain tables fall back to rows in the DOM
+  enter_elfinder(drv)              elFinder container in the page or in a same-origin
+                                   iframe (frame 'load' events + MutationObserver), switched into
+  wait_for_elfinder(drv)           instance created and first folder opened ('open' event)
+  wait_for_url(drv, part)          navigation after a submit / scripted click; page scripts
+  wait_for_unload(drv, el)         can't outlive an unload, so these two are WebDriverWait
+                                   at 50 ms (URL changed / old element gone)
+
+The time each step waited is recorded in a Waits log and printed once per run:
+
+  [logs] waits: login-form 0.18s, login-redirect 0.64s, elfinder-frame 0.02s, elfinder 0.91s (total 1.75s)
+"""
+import time
+
+POLL_S = 0.05   # only the navigation waits poll
+
+
+class Waits:
+    """Seconds waited per step, in order."""
+
+    def __init__(self):
+        self.steps: list[tuple[str, float]] = []
+
+    def add(self, step: str, secs: float) -> float:
+        self.steps.append((step, secs))
+        return secs
+
+    def total(self) -> float:
+        return sum(s for _, s in self.steps)
+
+    def report(self, tag: str) -> None:
+        if self.steps:
+            print(f"[{tag}] waits: " + ", ".join(f"{n} {s:.2f}s" for n, s in self.steps) +
+                  f" (total {self.total():.2f}s)", flush=True)
+
+
+# resolve(...) runs once; later calls are ignored
+JS_PRELUDE = r"""
+const done = arguments[arguments.length-1];
+const t0 = performance.now();
+let settled = false, obs = null, timer = null;
+const cleanup = [];
+const resolve = (ok, extra) => {
+  if (settled) return; settled = true;
+  if (obs) obs.disconnect(); clearTimeout(timer); cleanup.forEach(f => { try { f(); } catch(e) {} });
+  done(Object.assign({ok, ms: performance.now() - t0}, extra || {}));
+};
+const observe = (fn) => {
+  obs = new MutationObserver(fn);
+  obs.observe(document.documentElement, {childList:true, subtree:true, attributes:true, attributeFilter:['class']});
+};
+"""
+
+JS_SELECTOR = JS_PRELUDE + r"""
+const [sel, timeoutMs] = arguments;
+timer = setTimeout(() => resolve(false, {error:'timeout'}), timeoutMs);
+const check = () => { if (document.querySelector(sel)) resolve(true); };
+check();
+if (!settled) observe(check);
+"""
+
+JS_DATATABLE = JS_PRELUDE + r"""
+const [sel, timeoutMs] = arguments;
+timer = setTimeout(() => resolve(false, {error:'timeout'}), timeoutMs);
+const jq = window.jQuery;
+const dt = jq && jq.fn && jq.fn.dataTable;
+const rows = () => { const t = document.querySelector(sel); return !!(t && t.querySelector('tbody tr')); };
+if (!dt) {
+  // no DataTables on the page: server-rendered rows are the signal
+  const check = () => { if (rows()) resolve(true, {via:'dom'}); };
+  check();
+  if (!settled) observe(check);
+} else {
+  const table = () => document.querySelector(sel);
+  const complete = () => (dt.settings || []).some(s => s.nTable === table() && s._bInitComplete);
+  if (complete()) { resolve(true, {via:'complete'}); }
+  else {
+    // init.dt / draw.dt bubble to the document, also for tables initialised after this call
+    const onEvent = (e, settings) => {
+      if (settings && settings.nTable === table() && (e.type === 'init' || complete())) resolve(true, {via:e.type});
+    };
+    jq(document).on('init.dt draw.dt', onEvent);
+    cleanup.push(() => jq(document).off('init.dt draw.dt', onEvent));
+  }
+}
+"""
+
+# index of the iframe holding the container (-1: the page itself)
+JS_ELFINDER_FRAME = JS_PRELUDE + r"""
+const [timeoutMs] = arguments;
+const C = '.elfinder, #elfinder';
+timer = setTimeout(() => resolve(false, {error:'elFinder container not found'}), timeoutMs);
+const check = () => {
+  if (document.querySelector(C)) return resolve(true, {frame:-1});
+  const frames = document.querySelectorAll('iframe');
+  for (let i = 0; i < frames.length; i++) {
+    try { const d = frames[i].contentDocument; if (d && d.querySelector(C)) return resolve(true, {frame:i}); }
+    catch(e) {}  // cross-origin frame
+  }
+};
+// iframe load events don't bubble, but reach a capturing listener on the document
+document.addEventListener('load', check, true);
+cleanup.push(() => document.removeEventListener('load', check, true));
+check();
+if (!settled) observe(check);
+"""
+
+JS_ELFINDER = JS_PRELUDE + r"""
+const [timeoutMs] = arguments;
+let inst = null;
+timer = setTimeout(() => resolve(false, {error: inst ? 'no open event' : 'elFinder instance not initialized in time'}),
+                   timeoutMs);
+const instance = () => {
+  const jq = window.jQuery || window.$;
+  try { return (jq && jq('.elfinder').elfinder('instance')) || null; } catch(e) { return null; }
+};
+const check = () => {
+  if (inst || !(inst = instance())) return;
+  if (obs) { obs.disconnect(); obs = null; }
+  const cwd = inst.cwd && inst.cwd();
+  if (cwd && cwd.hash) return resolve(true, {via:'open'});
+  const onOpen = () => resolve(true, {via:'open-event'});
+  inst.bind('open', onOpen);
+  cleanup.push(() => inst.unbind('open', onOpen));  // also on timeout: no stale handler
+};
+check();
+if (!inst) observe(check);
+"""
+
+
+def _run(drv, script: str, timeout: float, *args) -> dict:
+    """execute_async_script with a script timeout just above the page-side one."""
+    prev = None
+    try:
+        prev = drv.timeouts.script
+    except Exception:
+        pass
+    drv.set_script_timeout(timeout + 5)
+    try:
+        return drv.execute_async_script(script, *args, int(timeout * 1000)) or {}
+    finally:
+        if prev is not None:
+            drv.set_script_timeout(prev)
+
+
+def _timed(drv, step: str, waits: Waits | None, script: str, timeout: float, *args) -> dict:
+    t0 = time.perf_counter()
+    res = _run(drv, script, timeout, *args)
+    if waits is not None:
+        waits.add(step, time.perf_counter() - t0)
+    if not res.get("ok"):
+        raise RuntimeError(f"{step}: {res.get('error', res)}")
+    return res
+
+
+def wait_for_selector(drv, css: str, timeout: float = 30, waits: Waits | None = None, step: str | None = None) -> dict:
+    return _timed(drv, step or css, waits, JS_SELECTOR, timeout, css)
+
+
+def wait_for_datatable(drv, css: str = "table.dataTable", timeout: float = 30,
+                       waits: Waits | None = None, step: str = "datatable") -> dict:
+    return _timed(drv, step, waits, JS_DATATABLE, timeout, css)
+
+
+def enter_elfinder(drv, timeout: float = 60, waits: Waits | None = None) -> None:
+    """Switch into the frame holding the elFinder container (no-op when it is in the page)."""
+    from selenium.webdriver.common.by import By
+    res = _timed(drv, "elfinder-frame", waits, JS_ELFINDER_FRAME, timeout)
+    if res["frame"] >= 0:
+        drv.switch_to.frame(drv.find_elements(By.TAG_NAME, "iframe")[res["frame"]])
+        print(f"[logs] Switched into iframe #{res['frame']} (elFinder container found)")
+
+
+def wait_for_elfinder(drv, timeout: float = 60, waits: Waits | None = None) -> dict:
+    return _timed(drv, "elfinder", waits, JS_ELFINDER, timeout)
+
+
+def _poll(drv, condition, timeout: float, waits: Waits | None, step: str) -> None:
+    from selenium.webdriver.support.ui import WebDriverWait
+    t0 = time.perf_counter()
+    try:
+        WebDriverWait(drv, timeout, poll_frequency=POLL_S).until(condition)
+    finally:
+        if waits is not None:
+            waits.add(step, time.perf_counter() - t0)
+
+
+def wait_for_url(drv, part: str, timeout: float = 20, waits: Waits | None = None, step: str = "redirect") -> None:
+    from selenium.webdriver.support import expected_conditions as EC
+    _poll(drv, EC.url_contains(part), timeout, waits, step)
+
+
+def wait_for_unload(drv, element, timeout: float = 20, waits: Waits | None = None, step: str = "navigation") -> None:
+    """Until element's page is gone (a scripted click started a navigation)."""
+    from selenium.webdriver.support import expected_conditions as EC
+    _poll(drv, EC.staleness_of(element), timeout, waits, step)
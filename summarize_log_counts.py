@@ -2,15 +2,21 @@
 # summarize_log_counts.py
 # Pull latest log from Google Drive via Apps Script, sum counters, POST results.
 
-import gzip
-import os, re, sys, base64
+import re, base64
 from zoneinfo import ZoneInfo
 from datetime import datetime, timedelta
-import time, random
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from typing import Callable
 
-import requests  # pip install requests
+import config
+from batch_fetch import KNOWN_BAD, TransportError, bisect_batches
+from day_index import INDEX_NAME, covered, decode_index, index_counts
+from incremental import IncrementalState
+from log_parse import (  # noqa: F401  (re-exported for callers importing this module)
+    normalize_text, sum_matches, parse_log_ts, latest_timestamp, latest_timestamp_from_stream,
+    bytes_to_text_maybe_gzip, PATT_ERR, PATT_ADD, PATT_UPDATE, count_log,
+)
+from ranged_fetch import count_ranged_many, is_large
+import webapp_client as webapp
 
 TZ = ZoneInfo("Europe/Rome")
 def is_valid_day(s: str | None) -> bool:
@@ -23,111 +29,144 @@ def yesterday_rome_str() -> str:
     return (datetime.now(TZ) - timedelta(days=1)).date().isoformat()
 
 
-# --- tiny .env loader ---
-def load_env(path=".env"):
-    if os.path.exists(path):
-        for ln in open(path, encoding="utf-8"):
-            if not ln.strip() or ln.lstrip().startswith("#") or "=" not in ln:
-                continue
-            k, v = ln.rstrip().split("=", 1)
-            os.environ.setdefault(k, v)
+def webapp_url() -> str:
+    """WEBAPP_URL, read on first use (SystemExit when unset)."""
+    return config.require("WEBAPP_URL")
 
-load_env()
-WEBAPP_URL = os.getenv("WEBAPP_URL", "").strip()
-if not WEBAPP_URL:
-    sys.exit("ERROR: set WEBAPP_URL in .env")
-
-DATE_FOR_FOLDER = os.getenv("LOGS_DATE")  # e.g. 2025-09-01
-
-def normalize_text(s: str) -> str:
-    s = re.sub(r"[\u200B\u200C\u200D\u2060\uFEFF]", "", s)
-    s = s.replace("\u00A0", " ")
-    return s
-
-def sum_matches(text: str, pattern: str) -> int:
-    total = 0
-    for m in re.finditer(pattern, text, flags=re.IGNORECASE):
-        try:
-            total += int(m.group(1))
-        except Exception:
-            pass
-    return total
-
-def latest_timestamp(text: str) -> datetime | None:
-    ts_pat = re.compile(
-        r"^([A-Z][a-z]{2},\s\d{2}\s[A-Z][a-z]{2}\s\d{4}\s\d{2}:\d{2}:\d{2}\s[+-]\d{4})\b",
-        re.MULTILINE
-    )
-    best = None
-    for m in ts_pat.finditer(text):
-        ts_str = m.group(1)
-        try:
-            dt = datetime.strptime(ts_str, "%a, %d %b %Y %H:%M:%S %z")
-            if (best is None) or (dt > best):
-                best = dt
-        except Exception:
-            continue
-    return best
-
-def bytes_to_text_maybe_gzip(b: bytes) -> str:
-    # gzip magic: 1F 8B
-    if len(b) >= 2 and b[0] == 0x1F and b[1] == 0x8B:
-        try:
-            return gzip.decompress(b).decode("utf-8", errors="replace")
-        except Exception:
-            # fallback if something odd
-            return gzip.decompress(b).decode("latin-1", errors="replace")
-    return b.decode("utf-8", errors="replace")
-def list_logs_for_date(day: str) -> list[str]:
-    """Return a sorted list of filenames for the given date folder, or [] if none."""
+def list_logs_meta_for_date(day: str) -> list[dict]:
+    """listLogs entries (name + whatever metadata the web app sends) for .log/.log.gz files, sorted by name."""
     payload = {"listLogs": {"folderName": "LogsArchive", "date": day}}
-    r = requests.post(WEBAPP_URL, json=payload, timeout=120)
+    r = webapp.post(webapp_url(), json=payload, timeout=120)
     r.raise_for_status()
     data = r.json()
     if not data.get("ok"):
         return []
     files = data.get("files", [])
     # accept .log and .log.gz
-    names = [f["name"] for f in files if isinstance(f.get("name"), str) and (f["name"].endswith(".log") or f["name"].endswith(".log.gz"))]
-    return sorted(names)
+    metas = [f for f in files if isinstance(f.get("name"), str) and (f["name"].endswith(".log") or f["name"].endswith(".log.gz"))]
+    return sorted(metas, key=lambda f: f["name"])
+
+def list_logs_for_date(day: str) -> list[str]:
+    """Return a sorted list of filenames for the given date folder, or [] if none."""
+    return [f["name"] for f in list_logs_meta_for_date(day)]
+
+def load_day_index(day: str) -> dict[str, dict]:
+    """get_logs_day's sidecar index for the day ({} when absent or unreadable)."""
+    payload = {"getLogsBatch": {"folderName": "LogsArchive", "date": day, "filenames": [INDEX_NAME]}}
+    try:
+        r = webapp.post(webapp_url(), json=payload, timeout=(15, 180))
+        items = r.json().get("files", [])
+    except Exception:
+        return {}
+    if not items or not items[0].get("ok"):
+        return {}
+    return decode_index(base64.b64decode(items[0]["contentBase64"]))
+
+def post_webapp(payload: dict) -> dict:
+    r = webapp.post(webapp_url(), json=payload, timeout=(15, 180))
+    r.raise_for_status()
+    return r.json()
 
 def fetch_log_text_by_filename(day: str, filename: str) -> str:
     """Get one file's text by exact filename under the date folder."""
     payload = {"getLatestLog": {"folderName": "LogsArchive", "date": day, "filename": filename}}
-    r = requests.post(WEBAPP_URL, json=payload, timeout=180)
+    r = webapp.post(webapp_url(), json=payload, timeout=180)
     r.raise_for_status()
     data = r.json()
     if not data.get("ok"):
         raise RuntimeError(f"Drive fetch failed for {day}/{filename}: {data}")
     raw = base64.b64decode(data["contentBase64"])
     return bytes_to_text_maybe_gzip(raw)
-def summarize_day_and_post(day: str):
-    files = list_logs_for_date(day)
+def fold_incremental(day: str, metas: list[dict], counts_by_name: dict[str, dict]) -> list[str]:
+    """
+    Intraday mode: files whose listLogs fingerprint is unchanged reuse stored counters,
+    the rest are fetched with fromOffsets hints and only their appended bytes are counted.
+    Returns the misses; state is saved under INCREMENTAL_DIR.
+    """
+    state = IncrementalState("totals", day)
+    meta_by_name = {f["name"]: f for f in metas}
+    todo = []
+    for name, meta in meta_by_name.items():
+        if state.unchanged(name, meta):
+            counts_by_name[name] = state.skip(name)
+        else:
+            todo.append(name)
+
+    def fold(name: str, raw: bytes, item: dict) -> None:
+        c = state.fold(name, raw, count_log, item, meta_by_name.get(name))
+        if c is not None:
+            counts_by_name[name] = c
+
+    misses = stream_logs_batch(day, todo, on_raw=fold, offsets=state.offsets(todo), batch_size=20)
+    if state.refetch:
+        redo, state.refetch = state.refetch, []
+        misses += stream_logs_batch(day, redo, on_raw=fold, batch_size=20)
+    state.save()
+    print(f"[summarize] {day}: incremental skipped={state.stats['skipped']} "
+          f"tail={state.stats['tail']} full={state.stats['full']}")
+    return misses
+
+def summarize_day_and_post(day: str, incremental: bool | None = None, index: dict[str, dict] | None = None):
+    if incremental is None:
+        incremental = config.flag("INCREMENTAL")
+    metas = list_logs_meta_for_date(day)
+    files = [f["name"] for f in metas]
     if not files:
         print(f"[summarize] No logs found for {day}; skipping.")
         return {"ok": False, "day": day, "files": 0}
 
-    # Batch fetch all files' text
-    texts_by_name, misses = fetch_logs_batch(day, files, batch_size=20, base_sleep=0.25)
+    # Counters precomputed by get_logs_day first; raw logs only for files the index misses.
+    counts_by_name: dict[str, dict] = {}
+    pending = metas
+    if config.flag("USE_INDEX", True):  # USE_INDEX=0 wins over an index handed in
+        if index is None:
+            index = load_day_index(day)
+        pending = []
+        for meta in metas:
+            e = covered(index, meta)
+            if e:
+                counts_by_name[meta["name"]] = index_counts(e, "totals")
+            else:
+                pending.append(meta)
+        if index:
+            print(f"[summarize] {day}: index covers {len(counts_by_name)}/{len(metas)} files")
+
+    # Files too big for one response are read in ranges (ranged_fetch.py), as are batch misses below.
+    large = [f["name"] for f in pending if is_large(f)]
+    if large:
+        pending = [f for f in pending if not is_large(f)]
+
+    # Stream batches: each file is reduced to its counters as it arrives and its text dropped,
+    # so memory stays flat in the number of files.
+    if incremental:
+        misses = fold_incremental(day, pending, counts_by_name)
+    else:
+        def fold(name: str, text: str) -> None:
+            if text:
+                counts_by_name[name] = count_log(text)
+        misses = stream_logs_batch(day, [f["name"] for f in pending], fold, batch_size=20)
+    if large or misses:
+        # files that already failed alone (this run, any caller) are not read again in ranges
+        known = [n for n in misses if (day, n) in KNOWN_BAD]
+        ranged = [n for n in large + misses if (day, n) not in KNOWN_BAD]
+        misses = known + count_ranged_many(post_webapp, day, ranged, "totals",
+                                           on_counts=counts_by_name.__setitem__)
     if misses:
         print(f"[warn] {day}: {len(misses)} files could not be fetched (will be excluded). Example: {misses[:3]}")
 
-    patt_err    = r"Prodotti in errore Google\s*:\s*(\d+)"
-    patt_add    = r"Prodotti da aggiungere\s*:\s*(\d+)"
-    patt_update = r"Prodotti da aggiornare su Google\s*:\s*(\d+)"
+    return post_day_totals(day, counts_by_name, len(files), len(misses))
 
+def post_day_totals(day: str, counts_by_name: dict[str, dict], files: int, missed: int = 0) -> dict:
+    """Sum per-file count_log() results and post the day's logCounters row."""
     tot_err = tot_add = tot_update = 0
     latest_dt = None
 
-    for name in files:
-        text = texts_by_name.get(name)
-        if not text:
-            continue
-        tot_err    += sum_matches(text, patt_err)
-        tot_add    += sum_matches(text, patt_add)
-        tot_update += sum_matches(text, patt_update)
+    for c in counts_by_name.values():
+        tot_err    += c["errore"]
+        tot_add    += c["aggiungere"]
+        tot_update += c["aggiornare"]
 
-        dt = latest_timestamp(text)
+        dt = c["latest"]
         if dt and (latest_dt is None or dt > latest_dt):
             latest_dt = dt
 
@@ -142,120 +181,127 @@ def summarize_day_and_post(day: str):
             "aggiornare": tot_update
         }
     }
-    r = requests.post(WEBAPP_URL, json=payload, timeout=60)
-    print(f"[summarize] {day}: files={len(files)} used={len(texts_by_name)} miss={len(misses)} "
+    r = webapp.post(webapp_url(), json=payload, timeout=60)
+    print(f"[summarize] {day}: files={files} used={len(counts_by_name)} miss={missed} "
           f"errore={tot_err} aggiungere={tot_add} aggiornare={tot_update} → {r.status_code} {r.text.strip()}")
-    return {"ok": True, "day": day, "files": len(files), "used": len(texts_by_name),
-            "miss": len(misses), "errore": tot_err, "aggiungere": tot_add, "aggiornare": tot_update}
-def make_session() -> requests.Session:
-    retry = Retry(
-        total=5, connect=5, read=5,
-        backoff_factor=1.5,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods={"POST", "GET"},
-        raise_on_status=False,
-    )
-    s = requests.Session()
-    s.mount("https://", HTTPAdapter(max_retries=retry))
-    s.mount("http://",  HTTPAdapter(max_retries=retry))
-    return s
-def fetch_logs_batch(day: str, filenames: list[str], batch_size: int = 20,
-                     base_sleep: float = 0.25) -> tuple[dict[str, str], list[str]]:
+    return {"ok": True, "day": day, "files": files, "used": len(counts_by_name),
+            "miss": missed, "errore": tot_err, "aggiungere": tot_add, "aggiornare": tot_update}
+def stream_logs_batch(day: str, filenames: list[str],
+                      on_text: Callable[[str, str], None] | None = None,
+                      batch_size: int = 20,
+                      on_raw: Callable[[str, bytes, dict], None] | None = None,
+                      offsets: dict[str, int] | None = None) -> list[str]:
     """
-    Returns (texts_by_name, missing_names).
-    texts_by_name[name] = UTF-8 text (auto-gunzip if needed).
+    Fetch files in batches and hand each one to on_text(name, text) as soon as its
+    batch arrives (UTF-8, auto-gunzip). Nothing is kept after the callback returns.
+    on_raw(name, payload_bytes, item) gets the undecoded payload instead; offsets are
+    sent as the getLogsBatch fromOffsets hint (see incremental.py).
+    Returns the names that could not be fetched after the retry pass.
     """
-    session = make_session()
-    texts: dict[str, str] = {}
     missing: list[str] = []
 
     def chunks(seq, n):
         for i in range(0, len(seq), n):
             yield seq[i:i+n]
 
-    # First pass
-    for group in chunks(filenames, batch_size):
-        payload = {"getLogsBatch": {"folderName": "LogsArchive", "date": day, "filenames": group}}
-        r = session.post(WEBAPP_URL, json=payload, timeout=(15, 180))
+    def emit(item: dict) -> None:
+        name = item.get("name")
+        if not name:
+            return
+        seen.add(name)
+        if item.get("ok"):
+            try:
+                raw = base64.b64decode(item["contentBase64"])
+                if on_raw is not None:
+                    on_raw(name, raw, item)
+                else:
+                    on_text(name, bytes_to_text_maybe_gzip(raw))
+            except Exception as e:
+                # corrupt payload: no point asking again this run
+                print(f"[warn] {day}/{name}: unreadable payload ({e!r}); skipping")
+                KNOWN_BAD.add((day, name))
+                missing.append(name)
+        else:
+            missing.append(name)
+
+    def batch_payload(group: list[str]) -> dict:
+        body = {"folderName": "LogsArchive", "date": day, "filenames": group}
+        hint = {n: offsets[n] for n in group if n in offsets} if offsets else None
+        if hint:
+            body["fromOffsets"] = hint
+        return {"getLogsBatch": body}
+
+    def fetch(group: list[str]) -> dict | None:
+        # pacing and 429 backoff are the shared scheduler's (webapp_client)
+        try:
+            r = webapp.post(webapp_url(), json=batch_payload(group), timeout=(15, 180))
+        except Exception as e:
+            raise TransportError(repr(e)) from e
+        if r.status_code >= 400:
+            raise TransportError(f"HTTP {r.status_code}")
         try:
             data = r.json()
-        except Exception:
-            # retry once more slowly by splitting
-            for single in group:
-                payload1 = {"getLogsBatch": {"folderName": "LogsArchive", "date": day, "filenames": [single]}}
-                r1 = session.post(WEBAPP_URL, json=payload1, timeout=(15, 180))
-                try:
-                    d1 = r1.json()
-                except Exception:
-                    missing.append(single)
-                    continue
-                items = d1.get("files", [])
-                if not items:
-                    missing.append(single); continue
-                item = items[0]
-                if item.get("ok"):
-                    raw = base64.b64decode(item["contentBase64"])
-                    texts[single] = bytes_to_text_maybe_gzip(raw)
-                else:
-                    missing.append(single)
-            time.sleep(base_sleep + random.uniform(0, 0.15))
-            continue
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
 
+    def on_response(data: dict) -> None:
         for item in data.get("files", []):
-            name = item.get("name")
-            if not name:
-                continue
-            if item.get("ok"):
-                raw = base64.b64decode(item["contentBase64"])
-                texts[name] = bytes_to_text_maybe_gzip(raw)
-            else:
-                missing.append(name)
-        time.sleep(base_sleep + random.uniform(0, 0.15))
+            emit(item)
 
-    # Second pass for misses (slower, smaller batches)
+    def run_pass(names: list[str], size: int) -> None:
+        # unusable responses are halved until the bad file is alone (batch_fetch.bisect_batches)
+        for group in chunks(names, size):
+            seen.clear()
+            bad = bisect_batches(group, fetch, on_response, bad_key=lambda n: (day, n))
+            missing.extend(bad)
+            # names the app silently left out of an otherwise fine response
+            missing.extend(n for n in group if n not in seen and n not in bad)
+
+    seen: set[str] = set()
+
+    # First pass
+    run_pass(filenames, batch_size)
+
+    # Second pass for misses (smaller batches); known-bad files are not retried
     if missing:
-        retry_these = missing
-        missing = []
-        for group in chunks(retry_these, max(1, batch_size // 3)):
-            payload = {"getLogsBatch": {"folderName": "LogsArchive", "date": day, "filenames": group}}
-            r = session.post(WEBAPP_URL, json=payload, timeout=(15, 180))
-            ok_data = {}
-            try:
-                ok_data = r.json()
-            except Exception:
-                # last resort: mark all in this group missing
-                missing.extend(group)
-                continue
-
-            for item in ok_data.get("files", []):
-                name = item.get("name")
-                if not name:
-                    continue
-                if item.get("ok"):
-                    raw = base64.b64decode(item["contentBase64"])
-                    texts[name] = bytes_to_text_maybe_gzip(raw)
-                else:
-                    missing.append(name)
-            time.sleep(base_sleep*2 + random.uniform(0, 0.3))
+        retry_these = [n for n in dict.fromkeys(missing) if (day, n) not in KNOWN_BAD]
+        missing = [n for n in dict.fromkeys(missing) if (day, n) in KNOWN_BAD]
+        run_pass(retry_these, max(1, batch_size // 3))
 
+    return missing
+
+def fetch_logs_batch(day: str, filenames: list[str],
+                     batch_size: int = 20) -> tuple[dict[str, str], list[str]]:
+    """
+    Returns (texts_by_name, missing_names).
+    texts_by_name[name] = UTF-8 text (auto-gunzip if needed).
+    Holds every text in memory; prefer stream_logs_batch() for whole days.
+    """
+    texts: dict[str, str] = {}
+    missing = stream_logs_batch(day, filenames, texts.__setitem__, batch_size)
     return texts, missing
 
-def main():
-    # Prefer explicit LOGS_DATE if valid; else fallback
-    day_env = DATE_FOR_FOLDER if is_valid_day(DATE_FOR_FOLDER) else None
-    if day_env is None and DATE_FOR_FOLDER:
-        print(f"[summarize] Ignoring invalid LOGS_DATE='{DATE_FOR_FOLDER}' (expect YYYY-MM-DD)")
+def main(day: str | None = None, incremental: bool | None = None):
+    # Prefer an explicit day / LOGS_DATE if valid; else fallback
+    wanted = day or config.env("LOGS_DATE")  # e.g. 2025-09-01
+    day_env = wanted if is_valid_day(wanted) else None
+    if day_env is None and wanted:
+        print(f"[summarize] Ignoring invalid LOGS_DATE='{wanted}' (expect YYYY-MM-DD)")
 
     if day_env:
-        summarize_day_and_post(day_env)
+        summarize_day_and_post(day_env, incremental=incremental)
         return
 
     # Otherwise: try today, else yesterday (Europe/Rome)
     for d in (today_rome_str(), yesterday_rome_str()):
-        res = summarize_day_and_post(d)
+        res = summarize_day_and_post(d, incremental=incremental)
         if res.get("ok") and res.get("files", 0) > 0:
             return
     raise RuntimeError("No logs found for today or yesterday in LogsArchive")
 
 if __name__ == "__main__":
-    main()
+    from cassette import install_from_env
+    from profiling import profiled
+    install_from_env()
+    profiled(main)()
@@ -12,67 +12,58 @@ ENV:
   LOGS_DATE=YYYY-MM-DD      (optional; defaults to today Europe/Rome)
   LOGS_FOLDER=LogsArchive   (optional)
   TZ=Europe/Rome            (optional; default Europe/Rome)
+  INCREMENTAL=1             (optional; same as --incremental)
+  USE_INDEX=0               (optional; ignore get_logs_day's _index.json.gz and parse every raw log)
+  PARTIAL_DIR=...           (optional; shard partials, default artifacts/partials)
 
 CLI:
   python summarize_log_counts_by_partner.py --date 2025-09-03 --clear-first
+  python summarize_log_counts_by_partner.py --incremental   # hourly intraday refresh
+  python summarize_log_counts_by_partner.py --date 2025-09-03 --shard 0/4   # one per runner, 0..3
+  python summarize_log_counts_by_partner.py --date 2025-09-03 --merge --clear-first
 """
 import os
 import re, io, json, gzip, base64, argparse, datetime as dt
 from typing import Dict, List, Tuple
-import requests
+
+from batch_fetch import KNOWN_BAD, TransportError, bisect_batches
+from day_index import INDEX_NAME, covered, decode_index, index_counts
+from incremental import IncrementalState
+from log_parse import count_partner, file_feed_id
+from ranged_fetch import count_ranged_many, is_large
+import config
+import webapp_client as webapp
 
 # ---- env / args ----
-from typing import Final
+def _env(key: str, default: str = "") -> str:
+    """Environment variable as a plain string (never None); .env is loaded on first use."""
+    return config.env(key, default)
 
+def webapp_url() -> str:
+    return config.require("WEBAPP_URL")
 
-def load_env_here(filename: str = ".env") -> None:
-    here = os.path.dirname(__file__)
-    path = os.path.join(here, filename)
-    if not os.path.exists(path):
-        return
-    with open(path, "r", encoding="utf-8") as f:
-        for ln in f:
-            s = ln.strip()
-            if not s or s.startswith("#") or "=" not in s:
-                continue
-            k, v = s.split("=", 1)
-            k = k.strip()
-            v = v.strip().strip('"').strip("'")   # tolerate quoted values
-            if k and (k not in os.environ):
-                os.environ[k] = v
+def writer_url() -> str:
+    """Writer web app URL (LOGS_WRITER_URL); only needed when rows are written."""
+    return config.require("LOGS_WRITER_URL")
 
-load_env_here()
-
-def _env(key: str, default: str = "") -> str:
-    """Return environment variable as a plain string (never None)."""
-    v = os.getenv(key, default)
-    if v is None:
-        return default
-    return str(v)
- 
-
-WEBAPP_URL   = _env("WEBAPP_URL", "").strip()
-LOGS_FOLDER  = _env("LOGS_FOLDER", "LogsArchive").strip()
-TZ_NAME      = _env("TZ", "Europe/Rome").strip()
-# NEW: writer app URL + optional root folder name + chunk size
-LOGS_WRITER_URL: Final[str] = _env("LOGS_WRITER_URL").strip()
-LOGS_SHEETS_ROOT: Final[str] = _env("LOGS_SHEETS_ROOT", "Logs-Sheets").strip()
-UPSERT_CHUNK = int(_env("UPSERT_CHUNK", "80"))
-CLEAR_FIRST=1
-
-RX_ERRI   = r"prodotti\s+in\s+errore\s+google\s*:\s*([\d\.,]+)"
-RX_ADD    = r"prodotti\s+da\s+aggiungere\s*:\s*([\d\.,]+)"
-RX_UPDATE = r"prodotti\s+da\s+aggiornare\s+su\s+google\s*:\s*([\d\.,]+)"
+def logs_folder() -> str:
+    return _env("LOGS_FOLDER", "LogsArchive") or "LogsArchive"
 
 MAX_PER_CALL = 30  # matches your Apps Script getLogsBatch cap
 
-def parse_args():
+def parse_args(argv: List[str] | None = None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--date", help="YYYY-MM-DD (defaults to LOGS_DATE env or today in Europe/Rome)")
     ap.add_argument("--clear-first", action="store_true", help="Clear all rows for the date before upserting")
-    return ap.parse_args()
-if not LOGS_WRITER_URL:
-    raise SystemExit("Missing LOGS_WRITER_URL env (new writer web app URL)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Intraday mode: only parse bytes appended since the last run (state in INCREMENTAL_DIR)")
+    ap.add_argument("--shard", help="i/N (0-based): only parse files with feedId %% N == i and write a partial "
+                                    "result instead of the sheet")
+    ap.add_argument("--merge", action="store_true",
+                    help="combine all shard partials for the date and do the single sheet write")
+    ap.add_argument("--partial-dir", default=_env("PARTIAL_DIR", "artifacts/partials"),
+                    help="where shard partials are written / merged from (default artifacts/partials)")
+    return ap.parse_args(argv)
 
 # ---- time helpers ----
 try:
@@ -97,22 +88,13 @@ def yesterday_in_tz(tzname: str) -> dt.date:
 def log(*a): print("[by-partner]", *a, flush=True)
 
 def post_json(url: str, payload: dict, timeout: int = 120) -> dict:
-    r = requests.post(url, json=payload, timeout=timeout)
+    r = webapp.post(url, json=payload, timeout=timeout)
     r.raise_for_status()
     try:
         return r.json()
     except Exception:
         return {"ok": False, "error": f"Non-JSON response: {r.status_code}", "text": r.text[:500]}
 
-def parse_int(s: str) -> int:
-    return int(re.sub(r"[^\d]", "", s or "") or "0")
-
-def sum_matches(text: str, rx: str) -> int:
-    total = 0
-    for m in re.finditer(rx, text, flags=re.I):
-        total += parse_int(m.group(1))
-    return total
-
 def decode_log_content(entry: dict) -> str:
     """
     entry: object from getLogsBatch.files[]
@@ -137,30 +119,23 @@ def decode_log_content(entry: dict) -> str:
             return raw.decode("utf-8", errors="replace")
     return raw.decode("utf-8", errors="replace")
 
-def file_feed_id(filename: str) -> int | None:
-    # e.g., 2025-09-01_importDaemon_feed_442.log or .log.gz
-    m = re.search(r"feed[_-](\d+)\.log(?:\.gz)?$", filename)
-    return int(m.group(1)) if m else None
+def load_day_index(date: str) -> Dict[str, dict]:
+    """get_logs_day's sidecar index for the date ({} when absent or unreadable)."""
+    try:
+        r = post_json(webapp_url(), {"getLogsBatch": {"folderName": logs_folder(), "date": date, "filenames": [INDEX_NAME]}})
+    except Exception:
+        return {}
+    items = r.get("files", []) if r.get("ok") else []
+    if not items or not items[0].get("ok"):
+        return {}
+    return decode_index(base64.b64decode(items[0].get("contentBase64") or ""))
 
 # ---- main flow ----
-def main():
-    args = parse_args()
-    if not WEBAPP_URL:
-        raise SystemExit("Missing WEBAPP_URL env")
-
-    # allow overrides from CLI or env; otherwise default to yesterday in TZ
-    target_date = args.date or _env("LOGS_DATE")
-    if not target_date:
-        target_date = yesterday_in_tz(TZ_NAME).isoformat()
-
-    # allow CLEAR_FIRST via env when CLI flag not provided
-    clear_first_env = _env("CLEAR_FIRST").strip().lower() in ("1", "true", "yes", "y")
-    args.clear_first = bool(args.clear_first or clear_first_env)
-
-    log(f"Date: {target_date}  folder: {LOGS_FOLDER}")
-
+def collect_results(target_date: str, index: Dict[str, dict] | None = None, incremental: bool = False,
+                    shard: Tuple[int, int] | None = None) -> Dict[int, Dict[str, int]]:
+    """Steps 1-3: list, fetch and parse the day's logs → {feedId: counters}."""
     # 1) List logs for date
-    res = post_json(WEBAPP_URL, {"listLogs": {"folderName": LOGS_FOLDER, "date": target_date}})
+    res = post_json(webapp_url(), {"listLogs": {"folderName": logs_folder(), "date": target_date}})
     if not res.get("ok"):
         raise SystemExit(f"listLogs failed: {res}")
     files = res.get("files", [])
@@ -177,18 +152,46 @@ def main():
         if not prev or f.get("lastUpdated", 0) > prev.get("lastUpdated", 0):
             newest_by_name[nm] = f
     wanted_names = list(newest_by_name.keys())
+    if shard:
+        i, n = shard
+        wanted_names = [nm for nm in wanted_names if file_feed_id(nm) is not None and file_feed_id(nm) % n == i]
+        log(f"Shard {i}/{n}: {len(wanted_names)} files")
     if not wanted_names:
         log("No logs to fetch. Exiting.")
-        return
+        return {}
 
     # 3) Fetch in batches
     results: Dict[int, Dict[str, int]] = {}  # feedId -> counters
-    for i in range(0, len(wanted_names), MAX_PER_CALL):
-        chunk = wanted_names[i:i+MAX_PER_CALL]
-        r2 = post_json(WEBAPP_URL, {"getLogsBatch": {"folderName": LOGS_FOLDER, "date": target_date, "filenames": chunk}})
-        if not r2.get("ok"):
-            log("getLogsBatch failed on chunk:", r2)
-            continue
+
+    # Counters precomputed by get_logs_day; only files the index doesn't cover are downloaded
+    if config.flag("USE_INDEX", True):  # USE_INDEX=0 wins over an index handed in
+        if index is None:
+            index = load_day_index(target_date)
+        todo = []
+        for nm in wanted_names:
+            e = covered(index, newest_by_name[nm])
+            fid = file_feed_id(nm)
+            if e and fid is not None:
+                results[fid] = index_counts(e, "partner")
+            else:
+                todo.append(nm)
+        if index:
+            log(f"Index covers {len(wanted_names) - len(todo)}/{len(wanted_names)} files")
+        wanted_names = todo
+
+    kind = "partners" if not shard else f"partners-shard{shard[0]}of{shard[1]}"
+    state = IncrementalState(kind, target_date) if incremental else None
+    if state:
+        todo = []
+        for nm in wanted_names:
+            fid = file_feed_id(nm)
+            if fid is not None and state.unchanged(nm, newest_by_name[nm]):
+                results[fid] = state.skip(nm)
+            else:
+                todo.append(nm)
+        wanted_names = todo
+
+    def on_response(r2: dict) -> None:
         for entry in r2.get("files", []):
             if not entry.get("ok"):
                 continue
@@ -196,22 +199,75 @@ def main():
             fid = file_feed_id(nm)
             if fid is None:
                 continue
+            if state:
+                raw = base64.b64decode(entry.get("contentBase64") or "")
+                c = state.fold(nm, raw, count_partner, entry, newest_by_name.get(nm))
+                if c is not None:
+                    results[fid] = c
+                continue
             text = decode_log_content(entry)
             if not text:
                 continue
-            errore     = sum_matches(text, RX_ERRI)
-            aggiungere = sum_matches(text, RX_ADD)
-            aggiornare = sum_matches(text, RX_UPDATE)
-            results[fid] = {"errore": errore, "aggiungere": aggiungere, "aggiornare": aggiornare}
+            results[fid] = count_partner(text)
+
+    def fetch_chunks(names: List[str], offsets: Dict[str, int]) -> None:
+        def fetch(chunk: List[str]) -> dict | None:
+            body = {"folderName": logs_folder(), "date": target_date, "filenames": chunk}
+            hint = {n: offsets[n] for n in chunk if n in offsets}
+            if hint:
+                body["fromOffsets"] = hint
+            try:
+                r2 = post_json(webapp_url(), {"getLogsBatch": body})
+            except Exception as e:
+                log(f"getLogsBatch transport error on {len(chunk)} file(s): {e!r}")
+                raise TransportError(repr(e)) from e
+            if not r2.get("ok"):
+                log(f"getLogsBatch failed on {len(chunk)} file(s):", str(r2)[:300])
+                return None
+            return r2
+
+        for i in range(0, len(names), MAX_PER_CALL):
+            chunk = names[i:i+MAX_PER_CALL]
+            # a failed chunk is halved until the bad file is alone (batch_fetch.bisect_batches)
+            bad = bisect_batches(chunk, fetch, on_response, bad_key=lambda n: (target_date, n))
+            if bad:
+                log(f"{len(bad)} file(s) not fetched: {bad[:3]}")
+
+    # Files too big for one response are read in ranges (ranged_fetch.py), as are batch misses.
+    large = [nm for nm in wanted_names if is_large(newest_by_name[nm])]
+    if large:
+        wanted_names = [nm for nm in wanted_names if not is_large(newest_by_name[nm])]
+
+    fetch_chunks(wanted_names, state.offsets(wanted_names) if state else {})
+    if state:
+        if state.refetch:
+            redo, state.refetch = state.refetch, []
+            fetch_chunks(redo, {})
+        state.save()
+        log(f"Incremental: skipped={state.stats['skipped']} tail={state.stats['tail']} full={state.stats['full']}")
+
+    ranged = large + [nm for nm in wanted_names if file_feed_id(nm) is not None and file_feed_id(nm) not in results]
+    known = [nm for nm in ranged if (target_date, nm) in KNOWN_BAD]
+    if known:
+        # failed alone earlier in this process (either summarizer): not read again in ranges
+        log(f"Skipping {len(known)} known-bad file(s): {known[:3]}")
+        ranged = [nm for nm in ranged if (target_date, nm) not in KNOWN_BAD]
+    if ranged:
+        failed = count_ranged_many(lambda payload: post_json(webapp_url(), payload, timeout=180),
+                                   target_date, ranged, "partner", folder=logs_folder(),
+                                   on_counts=lambda nm, c: results.__setitem__(file_feed_id(nm), c))
+        if failed:
+            log(f"Could not read {len(failed)} file(s), excluded: {failed[:3]}")
 
     log(f"Parsed {len(results)} feed IDs")
+    return results
 
-    if not results:
-        log("No counters found; nothing to upsert.")
-        return
-
+def write_results(target_date: str, results: Dict[int, Dict[str, int]], clear_first: bool,
+                  logids: List[dict] | None = None) -> None:
+    """Steps 4-5: join with LogIDs and write the day tab via the writer app."""
     # 4) Fetch LogIDs mapping (onlyActive to reduce noise)
-    rmap = post_json(WEBAPP_URL, {"getLogIDs": {"sheetName": "LogIDs", "onlyActive": True}})
+    rmap = {"ok": True, "rows": logids} if logids is not None else \
+        post_json(webapp_url(), {"getLogIDs": {"sheetName": "LogIDs", "onlyActive": True}})
     if not rmap.get("ok"):
         log("getLogIDs failed:", rmap)
         # proceed with unknown partner names
@@ -239,24 +295,23 @@ def main():
 
     log(f"Collected {len(rows)} rows for {target_date}")
 
-    if not LOGS_WRITER_URL:
-        raise SystemExit("Missing LOGS_WRITER_URL env")
-
+    writer = writer_url()
+    chunk_size = int(_env("UPSERT_CHUNK", "80") or 80)
     first = True
     total_written = 0
-    for start in range(0, len(rows), UPSERT_CHUNK):
-        chunk = rows[start:start+UPSERT_CHUNK]
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start+chunk_size]
         log(f"Writing chunk {start}-{start+len(chunk)-1} (size {len(chunk)}) into monthly sheet / {target_date} tab via writer...")
 
         payload = {
             "writeDailyPartnerLogs": {
                 "date": target_date,
                 "rows": chunk,
-                "clearFirst": bool(args.clear_first and first),  # clear only on first chunk
-                "rootFolderName": LOGS_SHEETS_ROOT
+                "clearFirst": bool(clear_first and first),  # clear only on first chunk
+                "rootFolderName": _env("LOGS_SHEETS_ROOT", "Logs-Sheets") or "Logs-Sheets"
             }
         }
-        rsp = post_json(LOGS_WRITER_URL, payload, timeout=300)
+        rsp = post_json(writer, payload, timeout=300)
 
         if not rsp.get("ok"):
             log("Writer error:", rsp)
@@ -268,5 +323,89 @@ def main():
         first = False
 
     log(f"Wrote {total_written} rows total for {target_date}.")
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not m or not (0 <= int(m.group(1)) < int(m.group(2))):
+        raise SystemExit(f"--shard expects i/N with 0 <= i < N, got {spec!r}")
+    return int(m.group(1)), int(m.group(2))
+
+def partial_path(partial_dir: str, target_date: str, shard: Tuple[int, int]) -> str:
+    return os.path.join(partial_dir, target_date, f"shard-{shard[0]}-of-{shard[1]}.json")
+
+def write_partial(path: str, target_date: str, shard: Tuple[int, int], results: Dict[int, Dict[str, int]]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    body = {"version": 1, "date": target_date, "shard": shard[0], "of": shard[1],
+            "results": {str(fid): c for fid, c in results.items()}}
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        json.dump(body, f, separators=(",", ":"))
+    os.replace(path + ".part", path)
+
+def merge_partials(partial_dir: str, target_date: str) -> Dict[int, Dict[str, int]]:
+    """Combine every shard partial for the date; refuses to merge an incomplete set."""
+    day_dir = os.path.join(partial_dir, target_date)
+    names = sorted(f for f in os.listdir(day_dir) if f.startswith("shard-") and f.endswith(".json")) \
+        if os.path.isdir(day_dir) else []
+    if not names:
+        raise SystemExit(f"No shard partials in {day_dir}")
+    results: Dict[int, Dict[str, int]] = {}
+    seen, totals = set(), set()
+    for fn in names:
+        with open(os.path.join(day_dir, fn), "r", encoding="utf-8") as f:
+            body = json.load(f)
+        if body.get("date") != target_date:
+            raise SystemExit(f"{fn} is for {body.get('date')}, not {target_date}")
+        seen.add(body["shard"])
+        totals.add(body["of"])
+        for fid, c in body.get("results", {}).items():
+            results[int(fid)] = c
+    if len(totals) != 1 or seen != set(range(next(iter(totals)))):
+        raise SystemExit(f"Incomplete shard set in {day_dir}: have {sorted(seen)} of {sorted(totals)}")
+    log(f"Merged {len(names)} partials → {len(results)} feed IDs")
+    return results
+
+def main(argv: List[str] | None = None, index: Dict[str, dict] | None = None,
+         logids: List[dict] | None = None):
+    """
+    index / logids let an in-process caller (daily_pipeline.py) hand over get_logs_day's
+    index entries and collect_log_ids' rows instead of re-reading them from Drive / the sheet.
+    """
+    args = parse_args(argv)
+    webapp_url()
+    if not args.shard:
+        writer_url()  # fail before the parsing work, not at the first write
+
+    # allow overrides from CLI or env; otherwise default to yesterday in TZ
+    target_date = args.date or _env("LOGS_DATE")
+    if not target_date:
+        target_date = yesterday_in_tz(_env("TZ", "Europe/Rome") or "Europe/Rome").isoformat()
+
+    # allow CLEAR_FIRST via env when CLI flag not provided
+    clear_first_env = _env("CLEAR_FIRST").strip().lower() in ("1", "true", "yes", "y")
+    args.clear_first = bool(args.clear_first or clear_first_env)
+    args.incremental = bool(args.incremental or _env("INCREMENTAL").strip().lower() in ("1", "true", "yes", "y"))
+
+    log(f"Date: {target_date}  folder: {logs_folder()}")
+
+    if args.merge:
+        results = merge_partials(args.partial_dir, target_date)
+    else:
+        shard = parse_shard(args.shard) if args.shard else None
+        results = collect_results(target_date, index, args.incremental, shard)
+        if shard:
+            path = partial_path(args.partial_dir, target_date, shard)
+            write_partial(path, target_date, shard, results)
+            log(f"Wrote shard partial {path} ({len(results)} feed IDs)")
+            return
+
+    if not results:
+        log("No counters found; nothing to upsert.")
+        return
+
+    write_results(target_date, results, args.clear_first, logids)
+
 if __name__ == "__main__":
-    main()
+    from cassette import install_from_env
+    from profiling import profiled
+    install_from_env()
+    profiled(main)()
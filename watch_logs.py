@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# watch_logs.py — keep one elFinder session open and archive/summarize today's logs as they change
+"""
+Polls today's (Europe/Rome) entries in allegati-log with get_logs_day's day-filtered
+listing. A file counts as new/changed when its elFinder hash, ts or size differs from
+the last archived version. Each round with changes:
+
+  1. archives only those files (gzip upload, overwrite) and refreshes _index.json.gz
+  2. posts the day totals (summarize_log_counts with the fresh index: no raw downloads)
+  3. rewrites the day's per-partner rows from the index (by-partner writer, clearFirst:
+     the writer only appends otherwise, so partial rows would duplicate)
+
+Rounds without changes stretch the poll interval (× WATCH_BACKOFF up to
+WATCH_MAX_INTERVAL); any change resets it. At midnight the previous day gets one
+last round before the watcher moves on. Per-day state (listing fingerprints + index
+entries) lives in WATCH_DIR (default .state/watch/), so a restart only archives
+what changed meanwhile. The browser session is rebuilt after repeated errors.
+
+ENV (plus get_logs_day's PORTAL_* / WEBAPP_URL and LOGS_WRITER_URL):
+  WATCH_INTERVAL=60          seconds between polls while files change
+  WATCH_MAX_INTERVAL=900     cap for the idle backoff
+  WATCH_BACKOFF=1.5          idle multiplier
+  WATCH_PARTNERS=1           also rewrite per-partner rows (0: totals only)
+
+CLI:
+  python watch_logs.py
+  python watch_logs.py --interval 30 --max-runtime 21000     # e.g. inside a 6 h CI job
+  python watch_logs.py --once                                # single round, then exit
+"""
+import argparse
+import json
+import os
+import time
+import traceback
+import datetime as dt
+from pathlib import Path
+
+import config
+import get_logs_day as G
+
+
+def log(*a): print("[watch]", *a, flush=True)
+
+
+def today_rome() -> str:
+    return dt.datetime.now(G.TZ).date().isoformat()
+
+
+def fingerprint(e: dict) -> list:
+    return [e.get("hash"), e.get("ts") or 0, e.get("size") or 0]
+
+
+class DayState:
+    """Listing fingerprints and index entries of one watched day, persisted as JSON."""
+
+    def __init__(self, day: str, root: str | None = None):
+        self.day = day
+        self.path = Path(root or config.env("WATCH_DIR", os.path.join(".state", "watch"))) / f"{day}.json"
+        data = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+        self.files: dict[str, list] = data.get("files", {})
+        self.index: dict[str, dict] = data.get("index", {})
+        self.unpublished: set[str] = set(data.get("unpublished", []))  # archived, sheets not updated yet
+
+    def changed(self, entries: list[dict]) -> list[dict]:
+        return [e for e in entries if self.files.get(e["name"]) != fingerprint(e)]
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".part")
+        tmp.write_text(json.dumps({"files": self.files, "index": self.index,
+                                   "unpublished": sorted(self.unpublished)}, separators=(",", ":")),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def publish(day: str, index: dict[str, dict], partners: bool) -> None:
+    """Day totals and the whole day tab of per-partner rows, both from the index."""
+    import summarize_log_counts
+    summarize_log_counts.summarize_day_and_post(day, index=index)
+    if not partners:
+        return
+    import summarize_log_counts_by_partner as P
+    from day_index import index_counts
+    results = {e["feedId"]: index_counts(e, "partner") for e in index.values() if e.get("feedId") is not None}
+    if results:
+        P.write_results(day, results, clear_first=True)
+
+
+def poll_day(drv, st: DayState, partners: bool) -> int:
+    """One round for st.day; returns the number of files archived."""
+    _, entries = G.list_day_entries(drv, st.day)
+    todo = st.changed(entries)
+    fresh = []
+    if todo:
+        log(f"{st.day}: {len(todo)} new/changed of {len(entries)}")
+    for i, e in enumerate(todo, 1):
+        entry = G.archive_entry(drv, e, st.day, label=f"[{i}/{len(todo)}] ")
+        if entry is None:
+            continue  # fingerprint not recorded: retried next round
+        st.files[e["name"]] = fingerprint(e)
+        st.index[entry["name"]] = entry
+        st.unpublished.add(entry["name"])
+        fresh.append(entry)
+    if fresh:
+        G.upload_index(st.day, list(st.index.values()))
+        st.save()
+    if st.unpublished:
+        # also retries a previous round whose sheet update failed
+        publish(st.day, st.index, partners)
+        st.unpublished.clear()
+        st.save()
+    return len(fresh)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--interval", type=float, default=config.num("WATCH_INTERVAL", 60.0))
+    ap.add_argument("--max-interval", type=float, default=config.num("WATCH_MAX_INTERVAL", 900.0))
+    ap.add_argument("--backoff", type=float, default=config.num("WATCH_BACKOFF", 1.5))
+    ap.add_argument("--max-runtime", type=float, default=0, help="exit after this many seconds (0 = run forever)")
+    ap.add_argument("--once", action="store_true", help="one round, then exit")
+    ap.add_argument("--no-partners", action="store_true", help="totals only")
+    return ap.parse_args()
+
+
+def main():
+    args = parse_args()
+    G.check_env()
+    partners = not args.no_partners and config.flag("WATCH_PARTNERS", True)
+    t_end = time.monotonic() + args.max_runtime if args.max_runtime else None
+    drv = None
+    errors = 0
+    interval = args.interval
+    st = DayState(today_rome())
+    try:
+        while True:
+            t0 = time.monotonic()
+            try:
+                if drv is None:
+                    drv = G.driver()
+                    waits = G.Waits()
+                    G.open_logs_browser(drv, waits)
+                    waits.report("watch")
+                day = today_rome()
+                if day != st.day:
+                    poll_day(drv, st, partners)  # late writes to the day that just ended
+                    st = DayState(day)
+                n = poll_day(drv, st, partners)
+                errors = 0
+                interval = args.interval if n else min(args.max_interval, interval * args.backoff)
+                log(f"{st.day}: round {time.monotonic() - t0:.1f}s, archived={n}, next poll in {interval:.0f}s")
+            except Exception as e:
+                errors += 1
+                log(f"round failed ({errors} in a row): {e!r}")
+                traceback.print_exc()
+                interval = min(args.max_interval, max(args.interval, interval) * args.backoff)
+                if errors >= 3 and drv is not None:
+                    log("restarting the browser session")
+                    try:
+                        drv.quit()
+                    except Exception:
+                        pass
+                    drv = None
+            if args.once or (t_end and time.monotonic() + interval > t_end):
+                break
+            time.sleep(interval)
+    finally:
+        if drv is not None:
+            drv.quit()
+
+
+if __name__ == "__main__":
+    from profiling import profiled
+    profiled(main)()
@@ -0,0 +1,400 @@
+# webapp_client.py
+"""
+One client for every Apps Script web-app call, shared by all scripts.
+
+  post(url, json=..., timeout=...)   drop-in for requests.post(); returns the Response
+
+Reads (READ_ACTIONS) go through a session that retries transport errors and
+500/502/504 (urllib3 Retry); everything else — uploads, counters, sheet writes — through
+one that only retries failed connects, since a write that timed out or got a 5xx may
+already have been applied. Both are shared by everybody. On top of that each endpoint — the env var holding
+the URL (WEBAPP_URL, LOGS_WRITER_URL) — gets a scheduler:
+
+  token bucket    WEBAPP_RATE calls/s (default 4), bursts up to WEBAPP_BURST (4)
+  concurrency     at most WEBAPP_CONCURRENCY calls in flight (6)
+  429 / 503       wait Retry-After (else 2, 4, 8 … 60 s) and halve the rate; each
+                  success adds back 1/20 of WEBAPP_RATE (AIMD), so throughput settles
+                  just under the quota instead of bouncing off it
+
+Bucket, in-flight slots, current rate and block-until are kept in WEBAPP_SCHED_STATE
+(default .state/webapp_scheduler.json) under an exclusive flock, so overlapping jobs
+on one runner (or the daily pipeline's threads) share one budget. Slots of dead
+processes are reclaimed. Per-endpoint overrides: <VAR>_RATE, <VAR>_BURST,
+<VAR>_CONCURRENCY (e.g. LOGS_WRITER_URL_CONCURRENCY=2). WEBAPP_RATE=0 turns the
+scheduler off (plain session, e.g. for cassette replays).
+
+Hedging: reads (listLogs, getLogsBatch, getLatestLog, getLogRange, getLogIDs) get a
+second copy once they have been in flight longer than the rolling p95 of that endpoint + action (last
+WEBAPP_HEDGE_WINDOW=200 calls of this process; WEBAPP_HEDGE_AFTER=60 s until
+WEBAPP_HEDGE_MIN_SAMPLES=8 are in, never below WEBAPP_HEDGE_MIN=1 s). The first
+usable response wins; the other copy is abandoned (its body is dropped when it
+arrives, its slot released). A hedge needs a free token and slot right away (it
+never queues behind the quota) and at most WEBAPP_HEDGE_MAX=10 % of calls are
+hedged. WEBAPP_HEDGE=0 turns it off. At exit each endpoint + action prints its
+latency percentiles and hedge counts:
+
+  [webapp] WEBAPP_URL getLogsBatch: 42 calls, p50 1.9s p95 6.2s p99 14.0s max 14.0s, hedged 3 (7%), won 2
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import math
+import os
+import queue
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+import config
+
+if TYPE_CHECKING:
+    import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: threads of one process still coordinate
+    fcntl = None
+
+ENDPOINT_VARS = ("WEBAPP_URL", "LOGS_WRITER_URL")
+THROTTLE_STATUS = (429, 503)
+SLOT_GRACE = 30.0   # seconds a slot outlives its request timeout before it is reclaimed
+READ_ACTIONS = ("listLogs", "getLogsBatch", "getLatestLog", "getLogRange", "getLogIDs")
+
+
+def log(*a): print("[webapp]", *a, flush=True)
+
+
+def endpoint_of(url: str) -> str:
+    """Name of the env var holding this URL (never the URL itself), or a short hash."""
+    for var in ENDPOINT_VARS:
+        if url and url == config.env(var):
+            return var
+    return "url:" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+
+def make_session(idempotent: bool = True) -> requests.Session:
+    """Retrying session; idempotent=False only retries connects (the request never left)."""
+    import requests  # imported with the first call, not with the module
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    retry = Retry(
+        total=5, connect=5, read=5 if idempotent else 0,
+        other=None if idempotent else 0,
+        backoff_factor=1.5,                  # 0s, 1.5s, 3s, 4.5s, 6s …
+        # 429/503 are the scheduler's (shared backoff)
+        status_forcelist=[500, 502, 504] if idempotent else [],
+        allowed_methods={"POST", "GET"},
+        respect_retry_after_header=False,    # else urllib3 retries 429/503 itself, unseen
+        raise_on_status=False,
+    )
+    s = requests.Session()
+    s.mount("https://", HTTPAdapter(max_retries=retry))
+    s.mount("http://",  HTTPAdapter(max_retries=retry))
+    return s
+
+
+def limits(endpoint: str) -> tuple[float, float, int]:
+    """(rate per s, burst, max in flight) for an endpoint."""
+    def get(name: str, default: str) -> float:
+        return float(config.env(f"{endpoint}_{name}") or config.env(f"WEBAPP_{name}", default) or default)
+    return get("RATE", "4"), max(1.0, get("BURST", "4")), max(1, int(get("CONCURRENCY", "6")))
+
+
+def retry_after_s(r: requests.Response) -> float | None:
+    v = (r.headers.get("Retry-After") or "").strip()
+    if not v:
+        return None
+    try:
+        return max(0.0, float(v))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(v).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill(pid, 0) is TerminateProcess there; such slots expire with their hold time
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Scheduler:
+    def __init__(self, path: str | None = None):
+        self.path = path or config.env("WEBAPP_SCHED_STATE", os.path.join(".state", "webapp_scheduler.json"))
+        self._tlock = threading.Lock()
+        self.stats = {"calls": 0, "throttled": 0, "waited_s": 0.0}
+
+    @contextmanager
+    def _state(self):
+        """Read-modify-write the shared state under the file lock."""
+        with self._tlock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a+", encoding="utf-8") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    try:
+                        state = json.loads(raw) if raw.strip() else {}
+                    except ValueError:
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state, separators=(",", ":")))
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _bucket(state: dict, endpoint: str, now: float) -> dict:
+        rate, burst, _ = limits(endpoint)
+        e = state.setdefault(endpoint, {"tokens": burst, "at": now, "rate": rate,
+                                        "blocked": 0.0, "fails": 0, "slots": {}})
+        e["rate"] = min(e["rate"], rate)
+        e["tokens"] = min(burst, e["tokens"] + max(0.0, now - e["at"]) * e["rate"])
+        e["at"] = now
+        e["slots"] = {k: v for k, v in e["slots"].items() if v > now and _alive(int(k.split(":")[0]))}
+        return e
+
+    def _take(self, endpoint: str, hold_s: float) -> tuple[str | None, float]:
+        """(slot id, 0) when a token and an in-flight slot are free now, else (None, seconds to wait)."""
+        _, _, conc = limits(endpoint)
+        now = time.time()
+        with self._state() as state:
+            e = self._bucket(state, endpoint, now)
+            if now >= e["blocked"] and e["tokens"] >= 1 and len(e["slots"]) < conc:
+                e["tokens"] -= 1
+                slot = f"{os.getpid()}:{threading.get_ident()}:{random.getrandbits(32):08x}"
+                e["slots"][slot] = now + hold_s
+                return slot, 0.0
+            return None, max(e["blocked"] - now, (1 - e["tokens"]) / max(e["rate"], 1e-3), 0.05)
+
+    def acquire(self, endpoint: str, hold_s: float) -> str:
+        """Block until a token and an in-flight slot are free; returns the slot id."""
+        t0 = time.monotonic()
+        while True:
+            slot, wait = self._take(endpoint, hold_s)
+            if slot:
+                break
+            time.sleep(min(wait, 1.0))
+        self.stats["calls"] += 1
+        self.stats["waited_s"] += time.monotonic() - t0
+        return slot
+
+    def try_acquire(self, endpoint: str, hold_s: float) -> str | None:
+        """A slot only if one is free right now (hedges never queue behind the quota)."""
+        slot, _ = self._take(endpoint, hold_s)
+        if slot:
+            self.stats["calls"] += 1
+        return slot
+
+    def release(self, endpoint: str, slot: str, throttled: bool = False, retry_after: float | None = None) -> None:
+        rate, _, _ = limits(endpoint)
+        now = time.time()
+        with self._state() as state:
+            e = self._bucket(state, endpoint, now)
+            e["slots"].pop(slot, None)
+            if throttled:
+                e["fails"] += 1
+                delay = retry_after if retry_after is not None else min(60.0, 2.0 ** e["fails"])
+                e["blocked"] = max(e["blocked"], now + delay)
+                e["rate"] = max(rate / 16, e["rate"] / 2)
+                e["tokens"] = min(e["tokens"], 0.0)
+            else:
+                e["fails"] = 0
+                e["rate"] = min(rate, e["rate"] + rate / 20)
+        if throttled:
+            self.stats["throttled"] += 1
+
+
+def action_of(body) -> str:
+    """The web-app action: the single top-level key of the JSON payload."""
+    return next(iter(body)) if isinstance(body, dict) and len(body) == 1 else type(body).__name__
+
+
+def hedgeable(body) -> bool:
+    """Only reads are hedged: a duplicate write can't be cancelled once it reaches the sheet."""
+    return action_of(body) in READ_ACTIONS
+
+
+def _pct(xs: list[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    s = sorted(xs)
+    return s[max(0, math.ceil(q * len(s)) - 1)]
+
+
+class Hedger:
+    """Call latencies per (endpoint, action): the hedge delay, the hedge budget and the exit report."""
+
+    def __init__(self):
+        self.window = max(1, config.num("WEBAPP_HEDGE_WINDOW", 200))
+        self.min_samples = max(1, config.num("WEBAPP_HEDGE_MIN_SAMPLES", 8))
+        self.fallback = config.num("WEBAPP_HEDGE_AFTER", 60.0)
+        self.floor = config.num("WEBAPP_HEDGE_MIN", 1.0)
+        self.budget = config.num("WEBAPP_HEDGE_MAX", 0.1)
+        self._lock = threading.Lock()
+        self.recent: dict[tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self.latencies: dict[tuple[str, str], list[float]] = defaultdict(list)
+        self.counts: dict[tuple[str, str], dict] = defaultdict(lambda: {"hedged": 0, "won": 0})
+
+    def delay(self, key: tuple[str, str]) -> float:
+        """Seconds to wait before hedging: the rolling p95 once there are enough samples."""
+        with self._lock:
+            xs = list(self.recent[key])
+        if len(xs) < self.min_samples:
+            return self.fallback
+        return max(self.floor, _pct(xs, 0.95))
+
+    def allow(self, key: tuple[str, str]) -> bool:
+        with self._lock:
+            return self.counts[key]["hedged"] < 1 + self.budget * len(self.latencies[key])
+
+    def hedged(self, key: tuple[str, str]) -> None:
+        with self._lock:
+            self.counts[key]["hedged"] += 1
+
+    def record(self, key: tuple[str, str], secs: float, won: bool = False) -> None:
+        with self._lock:
+            self.recent[key].append(secs)
+            self.latencies[key].append(secs)
+            if won:
+                self.counts[key]["won"] += 1
+
+    def report(self) -> None:
+        with self._lock:
+            rows = [(k, list(v), dict(self.counts[k])) for k, v in sorted(self.latencies.items())]
+        for (ep, action), xs, c in rows:
+            log(f"{ep} {action}: {len(xs)} calls, p50 {_pct(xs, 0.5):.1f}s p95 {_pct(xs, 0.95):.1f}s "
+                f"p99 {_pct(xs, 0.99):.1f}s max {max(xs):.1f}s, "
+                f"hedged {c['hedged']} ({c['hedged'] / len(xs):.0%}), won {c['won']}")
+
+
+_sessions: dict[bool, requests.Session] = {}
+_scheduler: Scheduler | None = None
+_hedger: Hedger | None = None
+_init_lock = threading.Lock()
+
+
+def session(body=None) -> requests.Session:
+    """The read session for READ_ACTIONS payloads, else the connect-retry-only one."""
+    idempotent = action_of(body) in READ_ACTIONS
+    with _init_lock:
+        if idempotent not in _sessions:
+            _sessions[idempotent] = make_session(idempotent)
+        return _sessions[idempotent]
+
+
+def scheduler() -> Scheduler:
+    global _scheduler
+    with _init_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def hedger() -> Hedger:
+    global _hedger
+    with _init_lock:
+        if _hedger is None:
+            _hedger = Hedger()
+            atexit.register(_hedger.report)
+        return _hedger
+
+
+def _send(ep: str, slot: str, url: str, json, timeout) -> tuple[requests.Response, bool, float | None]:
+    """One request in a held slot; the slot is released with its outcome."""
+    throttled, ra = False, None
+    try:
+        r = session(json).post(url, json=json, timeout=timeout)
+        throttled = r.status_code in THROTTLE_STATUS
+        ra = retry_after_s(r) if throttled else None
+    finally:
+        scheduler().release(ep, slot, throttled, ra)
+    return r, throttled, ra
+
+
+def _timed_send(ep: str, slot: str, url: str, json, timeout) -> tuple[requests.Response, bool, float | None]:
+    t0 = time.monotonic()
+    out = _send(ep, slot, url, json, timeout)
+    if not out[1]:
+        hedger().record((ep, action_of(json)), time.monotonic() - t0)
+    return out
+
+
+def _hedged_send(ep: str, slot: str, url: str, json, timeout, hold: float) -> tuple[requests.Response, bool, float | None]:
+    """_send(), plus a duplicate once the call outlives the rolling p95; the first usable answer wins."""
+    h, key = hedger(), (ep, action_of(json))
+    results: queue.Queue = queue.Queue()
+
+    def run(s: str, tag: str) -> None:
+        try:
+            results.put((tag, _send(ep, s, url, json, timeout), None))
+        except Exception as e:
+            results.put((tag, None, e))
+
+    t0 = time.monotonic()
+    # daemon threads: an abandoned copy never holds up the caller or interpreter exit
+    threading.Thread(target=run, args=(slot, "primary"), daemon=True).start()
+    pending, failed = 1, None
+    wait: float | None = h.delay(key)
+    while pending:
+        try:
+            tag, out, err = results.get(timeout=wait)
+        except queue.Empty:
+            wait = None
+            hslot = scheduler().try_acquire(ep, hold) if h.allow(key) else None
+            if hslot:
+                h.hedged(key)
+                pending += 1
+                log(f"{ep} {key[1]}: no answer after {time.monotonic() - t0:.1f}s, sending a hedge")
+                threading.Thread(target=run, args=(hslot, "hedge"), daemon=True).start()
+            continue
+        pending -= 1
+        if err is None and not out[1]:
+            h.record(key, time.monotonic() - t0, won=tag == "hedge")
+            return out
+        failed = failed or (out, err)
+    out, err = failed
+    if err is not None:
+        raise err
+    return out
+
+
+def post(url: str, json=None, timeout=120, max_throttled: int | None = None) -> requests.Response:
+    """requests.post() through the shared session and the endpoint's scheduler."""
+    ep = endpoint_of(url)
+    if limits(ep)[0] <= 0:
+        return session(json).post(url, json=json, timeout=timeout)
+    hold = (sum(timeout) if isinstance(timeout, tuple) else float(timeout)) + SLOT_GRACE
+    attempts = max_throttled if max_throttled is not None else config.num("WEBAPP_MAX_THROTTLED", 6)
+    hedge = config.flag("WEBAPP_HEDGE", True) and hedgeable(json)
+    sched = scheduler()
+    for attempt in range(attempts + 1):
+        slot = sched.acquire(ep, hold)
+        if hedge:
+            r, throttled, ra = _hedged_send(ep, slot, url, json, timeout, hold)
+        else:
+            r, throttled, ra = _timed_send(ep, slot, url, json, timeout)
+        if not throttled or attempt == attempts:
+            return r
+        log(f"{ep}: HTTP {r.status_code}, backing off" + (f" {ra:.0f}s" if ra is not None else "") +
+            f" ({attempt + 1}/{attempts})")
+    return r